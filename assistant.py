@@ -0,0 +1,115 @@
+import os
+import re
+import hashlib
+import time
+import unicodedata
+
+import shared_cache
+
+# ---------------------------------------------------------
+# Gemini 여행 비서: 스트리밍 응답 + 질문 캐시 + 최근 대화 문맥
+# ---------------------------------------------------------
+# - 응답을 조각(chunk) 단위로 흘려보내 첫 글자가 바로 보이게 한다
+# - 문맥 없는 첫 질문은 정규화한 질문으로 공유 캐시에 보관 (많은 사용자가 같은 질문을 함)
+# - 대화 기록은 최근 HISTORY_TURNS개만 모델에 보내고, 화면/세션에는 MAX_MESSAGES개만 남긴다
+# - 모델은 모듈 변수 make_model로 바꿔 끼울 수 있다 (API 키가 없거나 테스트할 때는 StubModel)
+# - google.generativeai는 import만 1초 가까이 걸리므로 첫 질문 때 읽는다
+
+MODEL_NAME = 'gemini-pro'
+HISTORY_TURNS = 6       # 문맥으로 보낼 최근 메시지 수 (질문/답 합쳐서)
+MAX_MESSAGES = 40       # 세션에 남길 메시지 수
+CACHE_TTL_S = 7 * 24 * 3600
+SYSTEM_HINT = "당신은 베를린 여행 도우미입니다. 한국어로 간결하게 답하세요."
+CONTEXT_HINT = "아래는 이 앱의 자료입니다. 관련 있으면 근거로 쓰고, 없는 내용은 지어내지 마세요."
+
+
+class _Chunk:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    # 네트워크 없이 동작하는 가짜 모델 (generate_content(stream=True)와 같은 모양으로 조각을 돌려준다)
+    def __init__(self, reply=None, delay_s=0.0):
+        self.reply = reply
+        self.delay_s = delay_s
+        self.calls = 0
+
+    def generate_content(self, contents, stream=False):
+        self.calls += 1
+        question = contents[-1]["parts"][0].splitlines()[-1].removeprefix("질문: ") if contents else ""
+        text = self.reply or f"(테스트 응답) '{question}'에 대한 답변입니다. 이전 대화 {len(contents) - 1}개를 참고했습니다."
+        chunks = [_Chunk(w) for w in re.findall(r"\S+\s*", text)]
+        if not stream: return _Chunk(text)
+        return self._stream(chunks)
+
+    def _stream(self, chunks):
+        for c in chunks:
+            if self.delay_s: time.sleep(self.delay_s)
+            yield c
+
+
+_API_KEY = [None]
+
+
+def configure(api_key):
+    # 키만 기억해 두고, 실제 설정은 모델을 처음 만들 때
+    _API_KEY[0] = api_key
+
+
+def gemini_model():
+    import google.generativeai as genai
+    if _API_KEY[0]:
+        genai.configure(api_key=_API_KEY[0])
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+# 테스트/오프라인에서는 lambda: StubModel() 등으로 바꿔 끼운다
+make_model = StubModel if os.environ.get("BERLIN_GEMINI_STUB") == "1" else gemini_model
+
+
+def normalize_prompt(prompt):
+    # 대소문자/유니코드/공백/끝 문장부호 차이를 없앤 캐시 키
+    q = unicodedata.normalize("NFKC", str(prompt)).casefold()
+    q = re.sub(r"\s+", " ", q).strip()
+    return q.rstrip("?!.？！。 ")
+
+
+def trim_history(messages):
+    # 세션에 남길 메시지 (오래된 것부터 버림)
+    return messages[-MAX_MESSAGES:]
+
+
+def build_contents(history, prompt, context=""):
+    # 최근 HISTORY_TURNS개 메시지 + 새 질문 -> Gemini contents 형식 (안내 문구는 맨 앞 질문에 붙임)
+    # 메시지는 질문/답 쌍으로 쌓이므로 HISTORY_TURNS가 짝수면 항상 user로 시작한다
+    # context: 앱 데이터에서 고른 참고 자료 (새 질문에만 붙이고 기록에는 남기지 않는다)
+    contents = [{"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]} for m in history[-HISTORY_TURNS:]]
+    if context: prompt = f"{CONTEXT_HINT}\n{context}\n\n질문: {prompt}"
+    contents.append({"role": "user", "parts": [prompt]})
+    contents[0] = {"role": contents[0]["role"], "parts": [f"{SYSTEM_HINT}\n\n{contents[0]['parts'][0]}"]}
+    return contents
+
+
+def stream_reply(prompt, history=(), context=""):
+    # 응답 조각을 차례로 내보내는 generator. 문맥 없는 질문이면 캐시를 먼저 본다
+    # (참고 자료가 바뀌면 답도 달라질 수 있으므로 자료도 키에 포함)
+    history = list(history)
+    key = None if history else f"{MODEL_NAME}|{normalize_prompt(prompt)}|{hashlib.sha1(context.encode('utf-8')).hexdigest()[:12]}"
+    if key:
+        hit = shared_cache.get_backend().get("gemini", key)
+        if hit is not None:
+            yield hit[0]
+            return
+    parts = []
+    for chunk in make_model().generate_content(build_contents(history, prompt, context), stream=True):
+        try:
+            text = chunk.text or ""
+        except ValueError:  # 안전 필터로 막힌 조각은 text가 없다
+            text = ""
+        parts.append(text)
+        yield text
+    if key and parts:
+        shared_cache.get_backend().set("gemini", key, "".join(parts), CACHE_TTL_S)
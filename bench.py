@@ -0,0 +1,242 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from datetime import date, timedelta
+
+# ---------------------------------------------------------
+# 오프라인 벤치마크: 핫 패스(범죄 엑셀 로드, OSM 파싱/분류, 지도 생성, 범죄 탭 집계 ...) 시간 측정
+# ---------------------------------------------------------
+# 외부 서비스(Overpass, Nominatim, open-meteo, Yahoo 환율, 구/권역 경계 GeoJSON)는 bench_fixtures/의 응답으로 바꿔 끼우고
+# 캐시 디렉터리는 임시 폴더를 쓰므로 네트워크 없이, 작업 중인 .cache를 건드리지 않고 돈다.
+# bench_fixtures/*.synthetic.json은 녹화본이 아니라 각 서비스 응답 형식에 맞춰 만든 가짜 데이터다
+# (OSM 요소/환율은 무작위, 경계는 구 12개 격자와 그 안을 나눈 권역 143개 - 이름/LOR 키만 실제 범죄 통계에서).
+# 규모와 형식은 비슷하지만 실제 값이 아니므로 결과는 상대 비교용. --record로 녹화한 <이름>.json이 있으면 그쪽을 쓴다.
+#   python bench.py                      # 전체
+#   python bench.py -k osm -n 20         # 이름에 osm이 들어간 항목만 20회
+#   python bench.py --save base.json     # 결과 저장
+#   python bench.py --compare base.json  # 저장한 결과보다 THRESHOLD 이상 느려진 항목이 있으면 종료 코드 1
+#   python bench.py --record             # 실제 서비스에서 fixture 다시 녹화 (네트워크 필요)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(HERE, "bench_fixtures")
+CENTER = (52.5200, 13.4050)   # 앱 기본 지도 중심
+RADIUS_M = 3000
+GEOCODE_QUERIES = ["Kreuzberg Berlin", "Alexanderplatz Berlin", "Tempelhofer Feld Berlin", "Mauerpark Berlin", "KaDeWe Berlin"]
+FX_DAYS = 400
+THRESHOLD = 0.20   # --compare: 중앙값이 20% 넘게 늘면 회귀
+
+# 모듈을 읽기 전에 캐시 위치를 임시 폴더로 (crime_data.CACHE_DIR 등이 import 시점에 정해진다)
+_TMP = tempfile.mkdtemp(prefix="berlin-bench-")
+os.environ["BERLIN_CACHE_DIR"] = _TMP
+os.environ["BERLIN_COMMUNITY_DB"] = os.path.join(_TMP, "community.sqlite")
+os.chdir(HERE)
+
+import folium
+
+import crime_data
+import crime_panel
+import external_data
+import fx_store
+import geo_data
+import geocode
+import map_layers
+import osm_places
+import perf
+import retrieval
+import shared_cache
+import spatial_join
+
+CRIME_FILE_NAME = "2023_berlin_crime.xlsx"
+
+
+def _fixture_path(name):
+    return os.path.join(FIXTURE_DIR, name)
+
+
+def _load_fixture(name):
+    # 녹화본(<name>.json)이 있으면 그것, 없으면 만든 가짜 데이터(<name>.synthetic.json)
+    path = _fixture_path(f"{name}.json")
+    if not os.path.exists(path): path = _fixture_path(f"{name}.synthetic.json")
+    with open(path, encoding="utf-8") as f: return json.load(f)
+
+
+def _save_fixture(name, data):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(_fixture_path(f"{name}.json"), "w", encoding="utf-8") as f: json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+# [fixture 응답으로 바꿔 끼우기]
+# 외부 서비스 호출은 모듈마다 변수 하나를 거친다: osm_places.fetch_overpass, geocode.fetch_geocode,
+# external_data.fetch_open_meteo, fx_store.fetch_daily, geo_data._fetch_source.
+# 여기(와 tests/)서는 그 변수만 fixture 응답으로 바꿔 네트워크 없이 앱과 같은 코드 경로를 돈다.
+def install_fixtures():
+    overpass = _load_fixture("overpass")
+    nominatim = _load_fixture("nominatim")
+    weather = _load_fixture("open_meteo")
+    fx_rows = [(date.fromisoformat(d), c) for d, c in _load_fixture("yahoo_eurkrw")]
+    shift = date.today() - fx_rows[-1][0]  # fixture의 마지막 날이 오늘이 되도록 날짜를 민다 (동기화할 구간이 fixture와 같게)
+    fx_rows = [(d + shift, c) for d, c in fx_rows]
+
+    osm_places.fetch_overpass = osm_places.replay_overpass(overpass["elements"])
+    geocode.fetch_geocode = lambda q: geocode.parse_nominatim(nominatim.get(q, []))
+    external_data.fetch_open_meteo = lambda: weather
+    fx_store.fetch_daily = lambda pair, start, end: [(d, c) for d, c in fx_rows if start <= d <= end]
+    # 구/권역 경계 원본 (geo/에 단순화본이 없으면 앱은 처음 한 번 받아서 캐시에 만든다)
+    boundaries = {kind: _load_fixture(f"geo_{kind}") for kind in geo_data.SOURCES}
+    geo_data._fetch_source = lambda kind: boundaries[kind]
+
+
+def record_fixtures():
+    # 실제 서비스에서 응답을 받아 bench_fixtures/에 저장 (앱이 보내는 것과 같은 쿼리)
+    wanted = {c: osm_places.tiles_for_radius(*CENTER, RADIUS_M) for c in osm_places.CATEGORY_TAGS}
+    data = osm_places.overpass_fetch(osm_places.build_tile_query(wanted))
+    if not data: sys.exit("Overpass 응답 없음")
+    _save_fixture("overpass", {"elements": data["elements"]})
+    _save_fixture("nominatim", {q: geocode._rate_limited_get({'q': q, 'format': 'json', 'limit': 1}) for q in GEOCODE_QUERIES})
+    _save_fixture("open_meteo", external_data.open_meteo_fetch())
+    for kind in geo_data.SOURCES:
+        _save_fixture(f"geo_{kind}", geo_data._fetch_source(kind))
+    today = date.today()
+    rows = fx_store.yahoo_daily(external_data.FX_PAIR, today - timedelta(days=FX_DAYS), today)
+    _save_fixture("yahoo_eurkrw", [[d.isoformat(), c] for d, c in rows])
+    print(f"녹화 완료: Overpass 요소 {len(data['elements'])}개, 환율 {len(rows)}일 -> {FIXTURE_DIR}")
+
+
+# ---------------------------------------------------------
+# 벤치마크 항목: (이름, setup, run). setup은 매 반복 전에 (시간 제외) 상태를 맞춘다
+# ---------------------------------------------------------
+def _clear_snapshots():
+    shutil.rmtree(crime_data.SNAPSHOT_DIR, ignore_errors=True)
+
+
+def _clear_osm():
+    osm_places.clear_cache()
+    shared_cache.get_backend().clear("osm_tile")
+    osm_places._FAILED_AT[0] = 0.0
+
+
+def _drop_classified():
+    # 타일은 두고 분류 결과(DataFrame)만 버린다 -> 분류 비용만 측정
+    for tiles in osm_places._TILES.values():
+        for t in tiles.values(): t._frame = None
+
+
+def build_main_map(fast=True):
+    # 지도 탭과 같은 구성 (범죄 레이어 + 맛집/호텔/관광 마커)
+    m = folium.Map(location=CENTER, zoom_start=14)
+    geo = geo_data.get_boundaries('bezirk', geo_data.level_for_zoom(14))
+    df = crime_data.load_crime_data_excel(CRIME_FILE_NAME)
+
+    def build(target):
+        if geo is None or df.empty: return None
+        return folium.Choropleth(geo_data=geo, data=df, columns=["District", "Total_Crime"], key_on="feature.properties.name",
+                                 fill_color="YlOrRd", fill_opacity=0.5, line_opacity=0.2, name="범죄").add_to(target)
+
+    map_layers.add_static_layer(m, ("bench-crime", 14), build, name="범죄")
+    for category, name, color, icon in (('restaurant', "맛집", 'green', 'cutlery'), ('hotel', "호텔", 'blue', 'bed'), ('tourism', "관광", 'purple', 'camera')):
+        places = map_layers.cull_places(osm_places.get_osm_places(category, *CENTER, RADIUS_M), CENTER)
+        map_layers.add_place_layer(m, spatial_join.annotate_places(places), name, color, icon, fast=fast)
+    return m.get_root().render()
+
+
+def crime_tab_aggregation():
+    # 범죄 탭이 rerun마다 하는 계산 (차트 그리기 제외)
+    df = crime_data.load_crime_data_excel(CRIME_FILE_NAME)
+    cols = [c for c in df.columns if c not in ['District', '총범죄', 'Total_Crime', 'LOR-Schlüssel (Bezirksregion)']]
+    district = sorted(df['District'].unique())[0]
+    df[df['District'] == district][cols].sum().sort_values(ascending=False).head(5)
+    df.sort_values('총범죄')
+    df[cols].sum().sort_values(ascending=False).head(10)
+    panel = crime_panel.load_crime_panel()
+    crime_panel.district_trend(panel, '총범죄', 'count')
+    crime_panel.year_over_year(panel, district, '총범죄')
+    hz_year = int(panel.loc[panel['hz'].notna(), 'year'].max())
+    panel[(panel['year'] == hz_year) & (panel['level'] == 'bezirk') & (panel['offence'] == '총범죄')].sort_values('hz')
+
+
+def _reset_retrieval():
+    retrieval._INDEX.clear()
+
+
+def _reset_fx():
+    if os.path.exists(fx_store.DB_PATH): os.remove(fx_store.DB_PATH)
+    shared_cache.get_backend().clear("fx_synced")
+
+
+def _reset_weather():
+    external_data.fetch_weather_forecast.cache_clear()
+    shared_cache.get_backend().clear("weather")
+
+
+def _reset_geocode():
+    shared_cache.get_backend().clear("geocode")
+
+
+CASES = [
+    ("crime_excel.cold", _clear_snapshots, lambda: crime_data.load_crime_data_excel(CRIME_FILE_NAME)),
+    ("crime_excel.snapshot", None, lambda: crime_data.load_crime_data_excel(CRIME_FILE_NAME)),
+    ("crime_panel.cold", lambda: (crime_panel._FRAME_CACHE.clear(), _clear_snapshots()), crime_panel.load_crime_panel),
+    ("crime_panel.warm", None, crime_panel.load_crime_panel),
+    ("crime_tab.aggregate", None, crime_tab_aggregation),
+    ("osm.fetch_parse", _clear_osm, lambda: osm_places.ensure_tiles(list(osm_places.CATEGORY_TAGS), *CENTER, RADIUS_M)),
+    ("osm.classify", _drop_classified, lambda: [osm_places.get_osm_places(c, *CENTER, RADIUS_M) for c in osm_places.CATEGORY_TAGS]),
+    ("osm.query_warm", None, lambda: osm_places.get_osm_places('restaurant', *CENTER, RADIUS_M, ["한식", "카페"])),
+    ("map.build.cold", map_layers.render_cache_clear, build_main_map),
+    ("map.build.warm", None, build_main_map),
+    ("map.build.markers", None, lambda: build_main_map(fast=False)),
+    ("weather.parse", _reset_weather, external_data.fetch_weather_forecast),
+    ("fx.sync_load.cold", _reset_fx, lambda: external_data.fetch_exchange_rate_history.__wrapped__("1y")),
+    ("fx.sync_load.warm", None, lambda: external_data.fetch_exchange_rate_history.__wrapped__("1y")),
+    ("geocode.lookup", _reset_geocode, lambda: [geocode.search_location(q) for q in GEOCODE_QUERIES]),
+    ("retrieval.build", _reset_retrieval, lambda: retrieval.get_index(CRIME_FILE_NAME)),
+    ("retrieval.query", None, lambda: retrieval.context_for("크로이츠베르크 맛집 치안", CRIME_FILE_NAME)),
+]
+
+
+def run_case(name, setup, fn, repeat):
+    if setup is None: fn()  # warm 항목: 한 번 돌려 캐시를 채운 뒤 측정
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        with perf.span(name):
+            t = time.perf_counter(); fn(); times.append(time.perf_counter() - t)
+    return {"n": repeat, "median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000, "max_ms": max(times) * 1000}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="베를린 앱 오프라인 벤치마크")
+    ap.add_argument("-n", "--repeat", type=int, default=5)
+    ap.add_argument("-k", "--filter", default="", help="이름에 이 문자열이 들어간 항목만")
+    ap.add_argument("--save", help="결과를 JSON으로 저장")
+    ap.add_argument("--compare", help="저장해 둔 결과와 비교")
+    ap.add_argument("--record", action="store_true", help="실제 서비스에서 fixture 녹화")
+    args = ap.parse_args(argv)
+    try:
+        if args.record: return record_fixtures()
+        install_fixtures()
+        results = {}
+        for name, setup, fn in CASES:
+            if args.filter not in name: continue
+            r = results[name] = run_case(name, setup, fn, args.repeat)
+            print(f"{name:<24} {r['median_ms']:9.1f} ms  (min {r['min_ms']:.1f}, max {r['max_ms']:.1f}, n={r['n']})")
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f: json.dump(results, f, indent=1)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f: base = json.load(f)
+            slower = [(n, base[n]['median_ms'], r['median_ms']) for n, r in results.items()
+                      if n in base and r['median_ms'] > base[n]['median_ms'] * (1 + THRESHOLD)]
+            for n, old, new in slower: print(f"회귀: {n} {old:.1f} -> {new:.1f} ms")
+            if slower: return 1
+    finally:
+        shutil.rmtree(_TMP, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import os
+import time
+import sqlite3
+
+# ---------------------------------------------------------
+# 후기 / 추천 / 댓글 저장소 (SQLite, 모든 세션이 공유)
+# ---------------------------------------------------------
+# session_state에 두면 세션마다 사라지고, 목록 전체를 매번 그려야 했다.
+# - WAL: 읽기는 쓰기를 기다리지 않고, 쓰기는 짧은 트랜잭션 하나씩
+# - (장소, 시간) / 시간 인덱스: 목록은 항상 한 페이지만 읽는다 (글이 쌓여도 비용 일정)
+# 캐시가 아니라 사용자 데이터이므로 .cache가 아닌 data/ 아래에 둔다
+
+DB_PATH = os.environ.get("BERLIN_COMMUNITY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "community.sqlite"))
+PAGE_SIZE = 5
+MAX_BODY = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (id INTEGER PRIMARY KEY, place TEXT NOT NULL, body TEXT NOT NULL, created_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_reviews_place_time ON reviews (place, created_at DESC);
+CREATE TABLE IF NOT EXISTS recommendations (id INTEGER PRIMARY KEY, place TEXT NOT NULL, reason TEXT NOT NULL, created_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_recommendations_time ON recommendations (created_at DESC);
+CREATE TABLE IF NOT EXISTS replies (id INTEGER PRIMARY KEY, rec_id INTEGER NOT NULL, body TEXT NOT NULL, created_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_replies_rec_time ON replies (rec_id, created_at);
+"""
+_READY = []
+
+
+def _connect():
+    # 세션(스레드)마다 짧게 연결. busy_timeout으로 동시 쓰기는 잠깐 기다렸다가 진행
+    if not _READY: os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=5)
+    conn.row_factory = sqlite3.Row
+    if not _READY:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _READY.append(True)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _write(sql, args):
+    conn = _connect()
+    try:
+        with conn: return conn.execute(sql, args).lastrowid
+    finally:
+        conn.close()
+
+
+def _read(sql, args=()):
+    conn = _connect()
+    try:
+        return [dict(r) for r in conn.execute(sql, args).fetchall()]
+    finally:
+        conn.close()
+
+
+def _clean(text):
+    return str(text or "").strip()[:MAX_BODY]
+
+
+# [후기]
+def add_review(place, body):
+    body = _clean(body)
+    if not body: return None
+    return _write("INSERT INTO reviews (place, body, created_at) VALUES (?, ?, ?)", (place, body, time.time()))
+
+
+def list_reviews(place, limit=PAGE_SIZE, offset=0):
+    return _read("SELECT id, body, created_at FROM reviews WHERE place = ? ORDER BY created_at DESC LIMIT ? OFFSET ?", (place, limit, offset))
+
+
+def count_reviews(place):
+    return _read("SELECT COUNT(*) AS n FROM reviews WHERE place = ?", (place,))[0]['n']
+
+
+def reviews_after(last_id, limit=1000):
+    # 증분 처리용 (검색 색인 등): last_id 이후에 쓰인 후기
+    return _read("SELECT id, place, body FROM reviews WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit))
+
+
+# [추천 + 댓글]
+def add_recommendation(place, reason):
+    place = _clean(place)
+    if not place: return None
+    return _write("INSERT INTO recommendations (place, reason, created_at) VALUES (?, ?, ?)", (place, _clean(reason), time.time()))
+
+
+def list_recommendations(limit=PAGE_SIZE, offset=0):
+    # 한 페이지 + 그 페이지 글들의 댓글 (쿼리 두 번)
+    recs = _read("SELECT id, place, reason, created_at FROM recommendations ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset))
+    if not recs: return recs
+    ids = [r['id'] for r in recs]
+    replies = _read(f"SELECT rec_id, body FROM replies WHERE rec_id IN ({','.join('?' * len(ids))}) ORDER BY created_at", ids)
+    by_rec = {}
+    for r in replies: by_rec.setdefault(r['rec_id'], []).append(r['body'])
+    for r in recs: r['replies'] = by_rec.get(r['id'], [])
+    return recs
+
+
+def recommendations_after(last_id, limit=1000):
+    return _read("SELECT id, place, reason FROM recommendations WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit))
+
+
+def count_recommendations():
+    return _read("SELECT COUNT(*) AS n FROM recommendations")[0]['n']
+
+
+def add_reply(rec_id, body):
+    body = _clean(body)
+    if not body: return None
+    return _write("INSERT INTO replies (rec_id, body, created_at) VALUES (?, ?, ?)", (rec_id, body, time.time()))
@@ -0,0 +1,47 @@
+# ---------------------------------------------------------
+# 여행 코스 데이터 (테마별 추천 코스)
+# ---------------------------------------------------------
+courses = {
+    "🌳 Theme 1: 숲과 힐링": [
+        {"name": "1. 전승기념탑", "lat": 52.5145, "lng": 13.3501, "desc": "베를린 전경이 한눈에 보이는 황금 천사상"},
+        {"name": "2. 티어가르텐 산책", "lat": 52.5135, "lng": 13.3575, "desc": "도심 속 거대한 허파"},
+        {"name": "3. Cafe am Neuen See (점심)", "lat": 52.5076, "lng": 13.3448, "type":"food", "desc": "호수 앞 비어가든 (피자/맥주)"},
+        {"name": "4. 베를린 동물원", "lat": 52.5079, "lng": 13.3377, "desc": "세계 최대 종을 보유한 동물원"},
+        {"name": "5. 카이저 빌헬름 교회", "lat": 52.5048, "lng": 13.3350, "desc": "전쟁의 상처를 간직한 교회"}
+    ],
+    "🎨 Theme 2: 예술과 고전": [
+        {"name": "1. 베를린 돔", "lat": 52.5190, "lng": 13.4010, "desc": "웅장한 돔 지붕"},
+        {"name": "2. 구 국립 미술관", "lat": 52.5208, "lng": 13.3982, "desc": "고전 예술의 정수"},
+        {"name": "3. Monsieur Vuong (맛집)", "lat": 52.5244, "lng": 13.4085, "type":"food", "desc": "유명 베트남 쌀국수 맛집"},
+        {"name": "4. Hackescher Hof", "lat": 52.5246, "lng": 13.4020, "desc": "아르누보 양식의 안뜰"},
+        {"name": "5. 제임스 사이먼 공원", "lat": 52.5213, "lng": 13.4005, "desc": "강변 산책로"}
+    ],
+    "🏰 Theme 3: 분단의 역사": [
+        {"name": "1. 베를린 장벽 기념관", "lat": 52.5352, "lng": 13.3903, "desc": "장벽의 실제 모습"},
+        {"name": "2. Mauerpark", "lat": 52.5404, "lng": 13.4048, "desc": "주말 벼룩시장과 공원"},
+        {"name": "3. Prater Beer Garden", "lat": 52.5399, "lng": 13.4101, "type":"food", "desc": "가장 오래된 야외 맥주집"},
+        {"name": "4. 체크포인트 찰리", "lat": 52.5074, "lng": 13.3904, "desc": "분단 시절 검문소"},
+        {"name": "5. Topography of Terror", "lat": 52.5065, "lng": 13.3835, "desc": "나치 역사관"}
+    ],
+    "🕶️ Theme 4: 힙스터 성지": [
+        {"name": "1. 이스트 사이드 갤러리", "lat": 52.5050, "lng": 13.4397, "desc": "장벽 위 야외 갤러리"},
+        {"name": "2. 오버바움 다리", "lat": 52.5015, "lng": 13.4455, "desc": "붉은 벽돌 다리"},
+        {"name": "3. Burgermeister (맛집)", "lat": 52.5005, "lng": 13.4420, "type":"food", "desc": "다리 밑 힙한 버거집"},
+        {"name": "4. Voo Store", "lat": 52.5005, "lng": 13.4215, "desc": "패션 피플들의 숨겨진 편집샵"},
+        {"name": "5. Landwehr Canal", "lat": 52.4960, "lng": 13.4150, "desc": "운하 산책"}
+    ],
+    "🛍️ Theme 5: 럭셔리 & 쇼핑": [
+        {"name": "1. KaDeWe 백화점", "lat": 52.5015, "lng": 13.3414, "desc": "유럽 최대 백화점"},
+        {"name": "2. 쿠담 거리", "lat": 52.5028, "lng": 13.3323, "desc": "베를린의 샹젤리제 명품 거리"},
+        {"name": "3. Schwarzes Café", "lat": 52.5060, "lng": 13.3250, "type":"food", "desc": "24시간 영업하는 예술가들의 아지트"},
+        {"name": "4. C/O Berlin", "lat": 52.5065, "lng": 13.3325, "desc": "사진 예술 전문 미술관"},
+        {"name": "5. Savignyplatz", "lat": 52.5060, "lng": 13.3220, "desc": "고풍스러운 서점과 카페 광장"}
+    ],
+    "🌙 Theme 6: 화려한 밤": [
+        {"name": "1. TV타워", "lat": 52.5208, "lng": 13.4094, "desc": "야경 감상"},
+        {"name": "2. 로젠탈러 거리", "lat": 52.5270, "lng": 13.4020, "desc": "트렌디한 골목"},
+        {"name": "3. Clärchens Ballhaus", "lat": 52.5265, "lng": 13.3965, "type":"food", "desc": "무도회장 분위기 식사"},
+        {"name": "4. Friedrichstadt-Palast", "lat": 52.5235, "lng": 13.3885, "desc": "화려한 쇼 관람"},
+        {"name": "5. 브란덴부르크 문", "lat": 52.5163, "lng": 13.3777, "desc": "밤 조명이 켜진 랜드마크"}
+    ]
+}
@@ -0,0 +1,148 @@
+import os
+import re
+import hashlib
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# ---------------------------------------------------------
+# 범죄 데이터 로딩 + 디스크 스냅샷 캐시
+# ---------------------------------------------------------
+# 엑셀(openpyxl) 파싱이 콜드 스타트의 대부분을 차지하므로,
+# 정제/번역이 끝난 DataFrame을 Feather 파일로 저장해 두고
+# 원본 파일의 (경로, mtime, 크기)가 바뀔 때만 다시 만든다.
+
+CACHE_DIR = os.environ.get("BERLIN_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshots")
+SNAPSHOT_VERSION = 3  # 정제 로직이 바뀌면 올려서 기존 스냅샷 무효화
+
+BERLIN_DISTRICTS = [
+    "Mitte", "Friedrichshain-Kreuzberg", "Pankow", "Charlottenburg-Wilmersdorf",
+    "Spandau", "Steglitz-Zehlendorf", "Tempelhof-Schöneberg", "Neukölln",
+    "Treptow-Köpenick", "Marzahn-Hellersdorf", "Lichtenberg", "Reinickendorf"
+]
+
+
+def get_crime_translation_map():
+    return {
+        'Raub': '강도', 'Straßenraub, Handtaschen-raub': '소매치기',
+        'Körper-verletzungen -insgesamt-': '상해(전체)', 'Gefährl. und schwere Körper-verletzung': '중상해',
+        'Freiheits-beraubung, Nötigung, Bedrohung, Nachstellung': '협박/스토킹',
+        'Diebstahl -insgesamt-': '절도(전체)', 'Diebstahl von Kraftwagen': '차량절도',
+        'Diebstahl an/aus Kfz': '차량털이', 'Fahrrad-diebstahl': '자전거절도',
+        'Wohnraum-einbruch': '빈집털이', 'Branddelikte -insgesamt-': '화재범죄',
+        'Brand-stiftung': '방화', 'Sach-beschädigung -insgesamt-': '기물파손',
+        'Sach-beschädigung durch Graffiti': '그래피티', 'Rauschgift-delikte': '마약범죄',
+        'Straftaten -insgesamt-': '총범죄', 'Kieztaten': '기타 지역범죄'
+    }
+
+
+def translate_crime_columns(columns):
+    # 키워드 매칭: 번역표 순서대로 첫 번째로 포함되는 키워드 사용.
+    # 엑셀 헤더의 줄바꿈 위치가 제각각이라 공백을 모두 지우고 비교한다.
+    trans_items = [(re.sub(r'\s+', '', k), v) for k, v in get_crime_translation_map().items()]
+    new_cols = {}
+    for col in columns:
+        clean_col = re.sub(r'\s+', '', str(col))
+        mapped = next((v for k, v in trans_items if k in clean_col), None)
+        if mapped is not None:
+            new_cols[col] = mapped
+        elif 'Bezeichnung' in clean_col:
+            new_cols[col] = 'District'
+    return new_cols
+
+
+def to_number(s):
+    # 숫자 변환: 이미 숫자면 그대로, '1.234' 같은 천 단위 구분 문자열만 구분자를 제거. '-' 등은 NaN
+    if pd.api.types.is_numeric_dtype(s): return s
+    text = s.astype(str).str.strip()
+    grouped = text.str.fullmatch(r'\d{1,3}([.,]\d{3})+')
+    text = text.where(~grouped, text.str.replace(r'[.,]', '', regex=True))
+    return pd.to_numeric(text, errors='coerce')
+
+
+def clean_crime_frame(df, districts_only=True):
+    df = df.rename(columns=translate_crime_columns(df.columns))
+    if 'District' not in df.columns: return pd.DataFrame()
+
+    if districts_only:
+        df = df[df['District'].isin(BERLIN_DISTRICTS)].copy()
+    else:
+        df = df.copy()
+
+    # 숫자 데이터 정제 (천 단위 구분자 제거). 이미 숫자인 컬럼은 그대로 둔다.
+    cols_to_clean = [c for c in df.columns if c != 'District' and 'LOR' not in str(c)]
+    if cols_to_clean:
+        df[cols_to_clean] = df[cols_to_clean].apply(to_number)
+        df[cols_to_clean] = df[cols_to_clean].fillna(0)
+
+    # 총범죄 컬럼 확보
+    if '총범죄' not in df.columns:
+        df['총범죄'] = df[cols_to_clean].sum(axis=1)
+    df['Total_Crime'] = df['총범죄']  # 지도용
+    return df.reset_index(drop=True)
+
+
+def _snapshot_path(file_name, tag):
+    st_ = os.stat(file_name)
+    key = f"{os.path.abspath(file_name)}|{st_.st_mtime_ns}|{st_.st_size}|{tag}|v{SNAPSHOT_VERSION}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return os.path.join(SNAPSHOT_DIR, f"{stem}.{tag}.{digest}.feather"), f"{stem}.{tag}."
+
+
+def _write_snapshot(df, path, prefix):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="uncompressed")
+    os.replace(tmp, path)  # 원자적 교체: 동시에 읽는 레플리카가 반쯤 쓴 파일을 보지 않도록
+    # 같은 원본의 옛 스냅샷 정리
+    for f in os.listdir(SNAPSHOT_DIR):
+        if f.startswith(prefix) and f.endswith(".feather") and os.path.join(SNAPSHOT_DIR, f) != path:
+            try: os.remove(os.path.join(SNAPSHOT_DIR, f))
+            except OSError: pass
+
+
+def cached_frame(file_name, tag, build):
+    # (원본 파일, tag) 단위 스냅샷. 있으면 메모리 맵으로 읽고, 없으면 build()로 만들어 저장.
+    path, prefix = _snapshot_path(file_name, tag)
+    if os.path.exists(path):
+        try:
+            # 압축하지 않은 Feather는 메모리 맵 읽기가 가능하다
+            return feather.read_table(path, memory_map=True).to_pandas()
+        except Exception:
+            pass
+    df = build()
+    if not df.empty:
+        try: _write_snapshot(df, path, prefix)
+        except Exception: pass  # 캐시 디렉터리에 쓸 수 없어도 앱은 동작해야 함
+    return df
+
+
+def load_crime_data_excel(file_name):
+    try:
+        return cached_frame(
+            file_name, "districts",
+            lambda: clean_crime_frame(pd.read_excel(file_name, skiprows=4, engine='openpyxl'))
+        )
+    except Exception:
+        return pd.DataFrame()
+
+
+def load_region_crime(file_name):
+    # LOR 권역(Bezirksregion) 단위 표: 권역 지도(choropleth)용. lor = 6자리 LOR 키
+    def build():
+        df = clean_crime_frame(pd.read_excel(file_name, skiprows=4, engine='openpyxl'), districts_only=False)
+        lor_col = next((c for c in df.columns if 'LOR' in str(c)), None)
+        if lor_col is None: return pd.DataFrame()
+        key = pd.to_numeric(df[lor_col], errors='coerce')
+        # 구 합계(xx0000), 미분류(xx9900), 베를린 전체(99xxxx) 행은 제외
+        is_region = key.notna() & (key % 10000 != 0) & (key % 10000 != 9900) & (key < 990000)
+        df = df[is_region].copy()
+        df['lor'] = key[is_region].astype(int).map('{:06d}'.format)
+        return df.reset_index(drop=True)
+    try:
+        return cached_frame(file_name, "regions", build)
+    except Exception:
+        return pd.DataFrame()
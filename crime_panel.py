@@ -0,0 +1,178 @@
+import io
+import os
+import re
+import glob
+
+import pandas as pd
+
+from crime_data import cached_frame, to_number, translate_crime_columns
+
+# ---------------------------------------------------------
+# 다년도 범죄 패널 (연도 × LOR × 범죄유형 × 건수/HZ)
+# ---------------------------------------------------------
+# - 연도별 시트/파일은 필요할 때만 읽고 (lazy), 각각 디스크 스냅샷으로 저장
+# - 새 연도 파일(예: Fallzahlen_2025.csv)을 폴더에 넣으면 그 파일만 새로 파싱
+# - Fallzahlen = 건수(count), HZ = 인구 10만명당 발생건수(hz)
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKBOOK_PATTERN = "Fallzahlen&HZ *.xlsx"
+CSV_PATTERNS = ["Fallzahlen_*.csv", "HZ_*.csv"]
+_SHEET_RE = re.compile(r"^(Fallzahlen|HZ)_(\d{4})$")
+_MEASURES = {"Fallzahlen": "count", "HZ": "hz"}
+
+PANEL_COLUMNS = ["year", "lor", "bezirk", "region", "level", "offence", "count", "hz"]
+
+# 프로세스 내 캐시: (경로, 시트, mtime, 크기) -> long-format 연도 프레임
+_FRAME_CACHE = {}
+_SHEET_CACHE = {}
+
+
+def _file_sig(path):
+    st_ = os.stat(path)
+    return (os.path.abspath(path), st_.st_mtime_ns, st_.st_size)
+
+
+def _sheet_names(path):
+    sig = _file_sig(path)
+    if sig not in _SHEET_CACHE:
+        _SHEET_CACHE[sig] = pd.ExcelFile(path, engine='openpyxl').sheet_names
+    return _SHEET_CACHE[sig]
+
+
+def discover_sources(data_dir=DATA_DIR):
+    # (measure, year) 별로 첫 번째로 발견된 원본만 사용. 통합 엑셀이 우선, 단일 CSV가 나머지를 채운다.
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, WORKBOOK_PATTERN))):
+        try: sheets = _sheet_names(path)
+        except Exception: continue
+        for sheet in sheets:
+            m = _SHEET_RE.match(sheet)
+            if m:
+                sources.setdefault((_MEASURES[m.group(1)], int(m.group(2))), (path, sheet))
+    for pattern in CSV_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(data_dir, pattern))):
+            m = _SHEET_RE.match(os.path.splitext(os.path.basename(path))[0])
+            if m:
+                sources.setdefault((_MEASURES[m.group(1)], int(m.group(2))), (path, None))
+    return sources
+
+
+def panel_signature(data_dir=DATA_DIR):
+    # 원본 구성이 바뀌었는지 판단하는 키 (st.cache_data 인자로 사용)
+    return tuple(sorted((m, y, src[1] or "") + _file_sig(src[0]) for (m, y), src in discover_sources(data_dir).items()))
+
+
+def available_years(data_dir=DATA_DIR):
+    return sorted({year for _, year in discover_sources(data_dir)})
+
+
+def _read_csv_table(path):
+    # 공공데이터 CSV는 인코딩이 제각각이고 위쪽에 제목 줄이 붙어 있을 수 있다
+    raw = open(path, 'rb').read()
+    # latin-1은 모든 바이트를 디코딩하므로 마지막 대안 (cp1252에 없는 0x81 등)
+    for enc in ('utf-8-sig', 'cp1252', 'latin-1'):
+        try:
+            text = raw.decode(enc); break
+        except UnicodeDecodeError:
+            continue
+    lines = text.splitlines()
+    header = next((i for i, line in enumerate(lines) if line.startswith('LOR')), 0)
+    return pd.read_csv(io.StringIO(text), skiprows=header, thousands=',', dtype={0: str})
+
+
+def _lor_key(value, name):
+    # LOR-Schlüssel: 앞 2자리 = 구(Bezirk), 나머지 4자리 = 권역(Bezirksregion). 6자리 문자열로 통일
+    try:
+        return f"{int(float(value)):06d}"
+    except (TypeError, ValueError):
+        return "999999" if 'Berlin' in str(name) else None
+
+
+def _level(lor):
+    if lor == "999999": return "berlin"
+    if lor.endswith("9900"): return "unassigned"
+    if lor.endswith("0000"): return "bezirk"
+    return "region"
+
+
+def normalize_crime_table(df, year, measure):
+    # 원본 표(넓은 형식) -> long-format 패널 조각
+    df = df.rename(columns=translate_crime_columns(df.columns))
+    lor_col = next((c for c in df.columns if 'LOR' in str(c)), None)
+    if lor_col is None or 'District' not in df.columns: return pd.DataFrame(columns=PANEL_COLUMNS)
+
+    region = df['District'].astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+    lor = pd.Series([_lor_key(v, n) for v, n in zip(df[lor_col], region)], index=df.index)
+    keep = lor.notna()
+    df, region, lor = df[keep], region[keep], lor[keep]
+
+    offence_cols = [c for c in df.columns if c not in ('District', lor_col)]
+    values = df[offence_cols].apply(to_number)
+    # 구 이름은 같은 구 코드의 'xx0000' 행 이름을 사용
+    bezirk_names = dict(zip(lor[lor.str.endswith("0000")].str[:2], region[lor.str.endswith("0000")]))
+    wide = values.assign(
+        lor=lor.values, region=region.values,
+        bezirk=lor.str[:2].map(bezirk_names).values,
+        level=[_level(k) for k in lor]
+    )
+    long = wide.melt(id_vars=['lor', 'bezirk', 'region', 'level'], value_vars=offence_cols,
+                     var_name='offence', value_name=measure)
+    long['offence'] = long['offence'].astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+    long.insert(0, 'year', year)
+    return long
+
+
+def _load_source(measure, year, path, sheet):
+    sig = _file_sig(path) + (sheet,)
+    frame = _FRAME_CACHE.get(sig)
+    if frame is None:
+        def build():
+            if sheet is None:
+                raw = _read_csv_table(path)
+            else:
+                raw = pd.read_excel(path, sheet_name=sheet, skiprows=4, engine='openpyxl')
+            return normalize_crime_table(raw, year, measure)
+        frame = cached_frame(path, f"panel-{sheet or 'csv'}-{measure}", build)
+        _FRAME_CACHE[sig] = frame
+    return frame
+
+
+def load_year(year, data_dir=DATA_DIR):
+    # 한 연도만 필요할 때: 해당 연도의 시트/파일만 읽는다
+    sources = discover_sources(data_dir)
+    keys = ['year', 'lor', 'bezirk', 'region', 'level', 'offence']
+    parts = {measure: _load_source(measure, y, *src) for (measure, y), src in sources.items() if y == year}
+    if not parts: return pd.DataFrame(columns=PANEL_COLUMNS)
+    if 'count' in parts and 'hz' in parts:
+        out = parts['count'].merge(parts['hz'][keys + ['hz']], on=keys, how='outer')
+    else:
+        out = next(iter(parts.values())).copy()
+    for col in ('count', 'hz'):
+        if col not in out.columns: out[col] = float('nan')
+    return out[PANEL_COLUMNS]
+
+
+def load_crime_panel(data_dir=DATA_DIR, years=None):
+    years = available_years(data_dir) if years is None else years
+    frames = [load_year(y, data_dir) for y in years]
+    frames = [f for f in frames if not f.empty]
+    if not frames: return pd.DataFrame(columns=PANEL_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+# ---------------------------------------------------------
+# 패널 기반 집계 (탭 4)
+# ---------------------------------------------------------
+def district_trend(panel, offence='총범죄', measure='count'):
+    # 구 × 연도 피벗 (구 단위 행만 사용)
+    d = panel[(panel['level'] == 'bezirk') & (panel['offence'] == offence)]
+    # 값이 없는 연도(예: 2024 HZ)가 0으로 합산되지 않도록 빈 값 행은 먼저 뺀다
+    d = d[d[measure].notna()]
+    return d.pivot_table(index='year', columns='bezirk', values=measure, aggfunc='sum').sort_index()
+
+
+def year_over_year(panel, district, offence='총범죄'):
+    d = panel[(panel['level'] == 'bezirk') & (panel['bezirk'] == district) & (panel['offence'] == offence)]
+    d = d.groupby('year')[['count', 'hz']].sum(min_count=1).sort_index()
+    d['yoy_pct'] = d['count'].pct_change() * 100
+    return d.reset_index()
@@ -0,0 +1,70 @@
+import requests
+import pandas as pd
+
+import fx_store
+import shared_cache
+from fetch_layer import ttl_cache
+
+# ---------------------------------------------------------
+# 상단 위젯용 외부 데이터 (환율 / 날씨)
+# ---------------------------------------------------------
+# 실패 시 예외를 그대로 올려 보낸다: 기본값 처리는 화면 쪽에서 하고,
+# 캐시는 예전 값을 유지하거나 실패를 잠깐 기억한다.
+
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast?latitude=52.52&longitude=13.41&current_weather=true&daily=weathercode,temperature_2m_max,temperature_2m_min&timezone=auto"
+HTTP_TIMEOUT_S = 10
+FX_PAIR = "EURKRW"
+FX_SYNC_INTERVAL_S = 3600
+
+
+# [환율] 1시간마다 빠진 날짜만 받아 로컬 시계열 저장소(fx_store)에 쌓고, 차트는 저장소에서 읽는다
+# 저장소가 프로세스 사이에 공유되므로 여기 캐시는 동기화 간격만 정한다
+# 마지막 동기화 시각은 공유 캐시에 남긴다 -> 다른 레플리카나 warmup.py가 방금 받았으면 새 프로세스도 건너뜀
+@ttl_cache(ttl=FX_SYNC_INTERVAL_S)
+def fetch_exchange_rate_history(period="1mo"):
+    days = fx_store.PERIOD_DAYS[period]
+    backend = shared_cache.get_backend()
+    if backend.get("fx_synced", f"{FX_PAIR}:{days}") is None:
+        try:
+            fx_store.sync(FX_PAIR, days)
+            backend.set("fx_synced", f"{FX_PAIR}:{days}", True, FX_SYNC_INTERVAL_S)
+        except Exception:
+            pass  # 받기 실패: 저장된 값이 있으면 그것으로
+    hist = fx_store.load(FX_PAIR, days)
+    if hist.empty: raise ValueError("환율 데이터 없음")
+    return hist
+
+
+# [날씨]
+def get_weather_desc(code):
+    if code == 0: return "☀️ 맑음"
+    if code in [1, 2, 3]: return "🌥️ 구름/흐림"
+    if code in [45, 48]: return "🌫️ 안개"
+    if code in [51, 53, 55, 61, 63, 65]: return "🌧️ 비"
+    if code in [71, 73, 75, 77]: return "❄️ 눈"
+    if code in [80, 81, 82]: return "🌦️ 소나기"
+    if code in [95, 96, 99]: return "⛈️ 천둥번개"
+    return "🌡️ 보통"
+
+
+def open_meteo_fetch():
+    return requests.get(WEATHER_URL, timeout=HTTP_TIMEOUT_S).json()
+
+
+fetch_open_meteo = open_meteo_fetch
+
+
+# 30분마다 갱신
+@ttl_cache(ttl=1800, shared="weather")
+def fetch_weather_forecast():
+    data = fetch_open_meteo()
+    current = data['current_weather']
+    daily = data['daily']
+    desc = get_weather_desc(current['weathercode'])
+    forecast_df = pd.DataFrame({
+        '날짜': daily['time'],
+        '상태': [get_weather_desc(c) for c in daily['weathercode']],
+        '최고': daily['temperature_2m_max'],
+        '최저': daily['temperature_2m_min']
+    })
+    return current['temperature'], desc, forecast_df
@@ -0,0 +1,142 @@
+import time
+import threading
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import shared_cache
+
+# ---------------------------------------------------------
+# 외부 API 호출 공통 레이어
+# ---------------------------------------------------------
+# - ttl_cache: TTL + stale-while-revalidate. 만료된 값은 일단 그대로 돌려주고
+#   백그라운드에서 새로 받아 교체한다 (사용자는 갱신을 기다리지 않음)
+# - 같은 키의 동시 miss는 한 번만 호출 (single-flight)
+# - run_concurrently: 서로 독립적인 호출을 스레드 풀에서 동시에 실행
+# - shared=이름 을 주면 프로세스 메모리 아래에 공유 디스크 캐시(shared_cache)를 한 층 더 둔다:
+#   새로 뜬 레플리카도 디스크에서 바로 채워지고, 원본 호출은 레플리카들 중 하나만 한다
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+
+
+def submit(fn, *args, **kwargs):
+    return _EXECUTOR.submit(fn, *args, **kwargs)
+
+
+def run_concurrently(calls):
+    # calls: {이름: (함수, 인자...)} -> {이름: 결과}. 실패한 호출은 예외 객체가 결과로 들어간다
+    futures = {name: _EXECUTOR.submit(call[0], *call[1:]) for name, call in calls.items()}
+    results = {}
+    for name, fut in futures.items():
+        try:
+            results[name] = fut.result()
+        except Exception as e:
+            results[name] = e
+    return results
+
+
+class _Entry:
+    __slots__ = ("value", "error", "fetched_at", "refreshing")
+
+    def __init__(self, value=None, error=None, fetched_at=0.0):
+        self.value = value
+        self.error = error
+        self.fetched_at = fetched_at
+        self.refreshing = False
+
+
+_STATS = {}
+
+
+def cache_stats():
+    # 함수별 카운터: hits(메모리) / stale(만료 값 제공) / misses(메모리에 없음) / calls(원본 호출) / errors
+    return {name: dict(s) for name, s in _STATS.items()}
+
+
+def ttl_cache(ttl, max_stale=24 * 3600, error_ttl=60, shared=None):
+    # ttl: 신선한 기간 / max_stale: 만료 후에도 stale 값을 내주는 기간 / error_ttl: 실패를 기억하는 기간
+    # shared: 공유 디스크 캐시 namespace (None이면 프로세스 메모리만)
+    def decorator(fn):
+        entries = {}
+        inflight = {}
+        lock = threading.Lock()
+        stats = _STATS[shared or fn.__qualname__] = {"hits": 0, "stale": 0, "misses": 0, "calls": 0, "errors": 0}
+
+        def _call(args, kwargs):
+            stats["calls"] += 1
+            return fn(*args, **kwargs)
+
+        def _fetch(key, args, kwargs, first):
+            if shared is None: return _call(args, kwargs), time.time()
+            skey = repr(key)
+            if first:
+                # 처음 보는 키: 다른 레플리카가 받아 둔 값이면 stale이라도 바로 쓰고 갱신은 SWR에 맡긴다
+                hit = shared_cache.get_backend().get(shared, skey)
+                if hit is not None: return hit
+            return shared_cache.fetch_once(shared, skey, ttl + max_stale, lambda: _call(args, kwargs), max_age=ttl)
+
+        def _load(key, args, kwargs, first=False):
+            try:
+                value, fetched_at = _fetch(key, args, kwargs, first)
+                entry = _Entry(value=value, fetched_at=fetched_at)
+            except Exception as e:
+                stats["errors"] += 1
+                old = entries.get(key)
+                if old is not None and old.error is None:
+                    # 갱신 실패: 이전 값을 유지하고 error_ttl 뒤에 다시 시도
+                    old.refreshing = False
+                    old.fetched_at = time.time() - ttl + error_ttl
+                    return old
+                entry = _Entry(error=e, fetched_at=time.time())
+            with lock:
+                entries[key] = entry
+            return entry
+
+        def _refresh(key, args, kwargs):
+            try:
+                _load(key, args, kwargs)
+            finally:
+                with lock:
+                    e = entries.get(key)
+                    if e is not None: e.refreshing = False
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.time()
+            with lock:
+                e = entries.get(key)
+                if e is not None:
+                    age = now - e.fetched_at
+                    if e.error is not None:
+                        if age < error_ttl: raise e.error
+                    elif age < ttl:
+                        stats["hits"] += 1
+                        return e.value
+                    elif age < ttl + max_stale:
+                        stats["stale"] += 1
+                        if not e.refreshing:
+                            e.refreshing = True
+                            _EXECUTOR.submit(_refresh, key, args, kwargs)
+                        return e.value
+                fut = inflight.get(key)
+                owner = fut is None
+                if owner:
+                    fut = inflight[key] = Future()
+                    stats["misses"] += 1
+            if owner:
+                try:
+                    entry = _load(key, args, kwargs, first=e is None)
+                    fut.set_result(entry)
+                finally:
+                    with lock: inflight.pop(key, None)
+            else:
+                entry = fut.result()
+            if entry.error is not None: raise entry.error
+            return entry.value
+
+        def cache_clear():
+            with lock: entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
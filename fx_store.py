@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+
+import shared_cache
+from crime_data import CACHE_DIR
+
+# ---------------------------------------------------------
+# 환율 일별 시계열 로컬 저장소
+# ---------------------------------------------------------
+# 매번 한 달치 전체를 받는 대신 일별 종가를 SQLite에 쌓아 두고,
+# 마지막으로 받은 날 이후(와 더 긴 기간을 처음 볼 때 앞쪽 빈 구간)만 받는다.
+# 차트와 현재 환율은 저장소에서 읽으므로 1y/5y 기간도 첫 동기화 뒤에는 추가 비용이 없다.
+
+DB_PATH = os.path.join(CACHE_DIR, "fx.sqlite")
+PERIOD_DAYS = {"5d": 7, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827}
+REFETCH_DAYS = 3  # 마지막 저장일 전 며칠은 다시 받는다 (장중 값/늦게 확정되는 종가 보정)
+
+_DB_LOCK = threading.Lock()
+
+
+def yahoo_daily(pair, start, end):
+    # [start, end] 구간 일별 종가 -> [(date, close), ...] (yfinance는 실제로 받을 때만 import)
+    import yfinance as yf
+    hist = yf.Ticker(f"{pair}=X").history(start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(), interval="1d")
+    return [(ts.date(), float(close)) for ts, close in zip(hist.index, hist['Close'])]
+
+
+fetch_daily = yahoo_daily
+
+
+def _connect():
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS rates (pair TEXT, day TEXT, close REAL, PRIMARY KEY (pair, day))")
+    # 받아 본 구간 (주말/휴일처럼 값이 없는 날도 다시 요청하지 않도록 값과 따로 기록)
+    conn.execute("CREATE TABLE IF NOT EXISTS coverage (pair TEXT PRIMARY KEY, first_day TEXT, last_day TEXT)")
+    return conn
+
+
+def _query(sql, args=()):
+    with _DB_LOCK:
+        conn = _connect()
+        try:
+            with conn: return conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+
+
+def coverage(pair):
+    rows = _query("SELECT first_day, last_day FROM coverage WHERE pair = ?", (pair,))
+    if not rows: return None, None
+    return date.fromisoformat(rows[0][0]), date.fromisoformat(rows[0][1])
+
+
+def _store(pair, rows, start):
+    # 받은 구간을 기록하되, 끝은 실제로 받은 마지막 날까지만 (provider가 아직 없는 날은 다음에 다시 받는다).
+    # 아무것도 못 받았으면 구간을 기록하지 않는다 -> 일시적 실패로 앞쪽 빈 구간이 영영 안 채워지는 일이 없도록
+    if not rows: return
+    first, last = coverage(pair)
+    newest = max(d for d, _ in rows)
+    first = start if first is None else min(first, start)
+    last = newest if last is None else max(last, newest)
+    with _DB_LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO rates VALUES (?, ?, ?)", [(pair, d.isoformat(), c) for d, c in rows])
+                conn.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)", (pair, first.isoformat(), last.isoformat()))
+        finally:
+            conn.close()
+
+
+def missing_ranges(pair, days, today=None):
+    # 최근 days일을 보여주려면 더 받아야 하는 [(start, end), ...]
+    today = today or date.today()
+    start = today - timedelta(days=days)
+    first, last = coverage(pair)
+    if first is None: return [(start, today)]
+    ranges = []
+    if start < first: ranges.append((start, first - timedelta(days=1)))
+    tail = max(last - timedelta(days=REFETCH_DAYS), first)
+    if tail <= today: ranges.append((tail, today))
+    return ranges
+
+
+def sync(pair, days, today=None):
+    # 빠진 구간만 받아 저장. 여러 프로세스가 동시에 부르면 하나만 받는다 -> 받은 행 수
+    with shared_cache.lease("fx", pair):
+        fetched = 0
+        for start, end in missing_ranges(pair, days, today):
+            rows = fetch_daily(pair, start, end)
+            _store(pair, rows, start)
+            fetched += len(rows)
+        return fetched
+
+
+def load(pair, days, today=None):
+    # 저장된 최근 days일 -> DataFrame(index=Date, Close)
+    today = today or date.today()
+    rows = _query(
+        "SELECT day, close FROM rates WHERE pair = ? AND day >= ? ORDER BY day",
+        (pair, (today - timedelta(days=days)).isoformat()),
+    )
+    df = pd.DataFrame(rows, columns=['Date', 'Close'])
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df.set_index('Date')
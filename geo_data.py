@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import threading
+from functools import lru_cache
+
+import numpy as np
+import requests
+
+import fetch_layer
+from crime_data import CACHE_DIR
+
+# ---------------------------------------------------------
+# 베를린 경계 데이터 (구 / LOR 권역) - 로컬 보관 + 단계별 단순화
+# ---------------------------------------------------------
+# - geo/ 폴더에 미리 단순화한 GeoJSON을 두고 (python geo_data.py 로 생성)
+# - 프로세스당 한 번만 파싱해서 메모리에 보관
+# - 지도 줌 레벨에 맞는 해상도를 골라 브라우저로 보내는 좌표 양을 줄인다
+
+GEO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geo")
+GEO_CACHE_DIR = os.path.join(CACHE_DIR, "geo")
+
+SOURCES = {
+    # 구(Bezirk) 12개: properties.name = 구 이름
+    "bezirk": "https://raw.githubusercontent.com/funkeinteraktiv/Berlin-Geodaten/master/berlin_bezirke.geojson",
+    # LOR 권역(Bezirksregion) ~140개 (LOR 2021, 베를린 오픈데이터)
+    "region": "https://tsb-opendata.s3.eu-central-1.amazonaws.com/lor_bezirksregionen_2021/lor_bezirksregionen_2021.geojson",
+}
+
+# 해상도 단계: (단순화 허용오차[도], 좌표 소수점 자리수)
+LEVELS = {
+    "high": (0.00005, 5),    # 줌 14 이상 (1px ≈ 10m)
+    "medium": (0.0002, 4),   # 줌 12~13
+    "low": (0.0008, 4),      # 줌 11 이하 (도시 전체)
+}
+
+_BUILD_LOCK = threading.Lock()
+_FAILED = {}  # kind -> 마지막 실패 시각 (오프라인일 때 매 rerun마다 원본을 다시 받지 않도록)
+RETRY_AFTER_S = 600
+_PREFETCHING = set()
+_PREFETCH_LOCK = threading.Lock()
+
+
+def level_for_zoom(zoom):
+    if zoom is None: return "medium"
+    if zoom >= 14: return "high"
+    if zoom >= 12: return "medium"
+    return "low"
+
+
+# [단순화] Douglas-Peucker (numpy, 반복형)
+def _simplify_line(coords, tolerance):
+    pts = np.asarray(coords, dtype=float)[:, :2]
+    n = len(pts)
+    if n < 3: return pts
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2: continue
+        a, b = pts[start], pts[end]
+        seg = pts[start + 1:end]
+        d = b - a
+        norm = np.hypot(d[0], d[1])
+        if norm == 0:
+            dist = np.hypot(seg[:, 0] - a[0], seg[:, 1] - a[1])
+        else:
+            dist = np.abs(d[0] * (seg[:, 1] - a[1]) - d[1] * (seg[:, 0] - a[0])) / norm
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.append((start, mid)); stack.append((mid, end))
+    return pts[keep]
+
+
+def _simplify_ring(ring, tolerance, digits):
+    # 닫힌 링은 시작점과 가장 먼 점에서 둘로 나눠야 DP가 안정적으로 동작
+    pts = np.asarray(ring, dtype=float)[:, :2]
+    if len(pts) <= 4: return np.round(pts, digits).tolist()
+    far = int(np.argmax(np.hypot(pts[:, 0] - pts[0, 0], pts[:, 1] - pts[0, 1])))
+    first = _simplify_line(pts[:far + 1], tolerance)
+    second = _simplify_line(pts[far:], tolerance)
+    out = np.round(np.vstack([first, second[1:]]), digits)
+    # 반올림 후 중복 좌표 제거
+    dup = np.r_[False, np.all(out[1:] == out[:-1], axis=1)]
+    out = out[~dup]
+    if len(out) < 4: return None
+    return out.tolist()
+
+
+def simplify_geometry(geom, tolerance, digits):
+    if geom["type"] == "Polygon":
+        polys = [geom["coordinates"]]
+    elif geom["type"] == "MultiPolygon":
+        polys = geom["coordinates"]
+    else:
+        return geom
+    out = []
+    for poly in polys:
+        rings = [_simplify_ring(r, tolerance, digits) for r in poly]
+        if rings[0] is None: continue  # 외곽선이 사라질 만큼 작은 조각은 버린다
+        out.append([r for r in rings if r is not None])
+    if not out: out = [[_simplify_ring(polys[0][0], 0, digits) or polys[0][0]]]
+    if len(out) == 1: return {"type": "Polygon", "coordinates": out[0]}
+    return {"type": "MultiPolygon", "coordinates": out}
+
+
+# [속성 정규화] 어떤 원본이든 properties = {name, lor} 형태로 맞춘다
+def _normalize_properties(kind, props):
+    if kind == "bezirk":
+        name = props.get("name") or props.get("Gemeinde_name") or props.get("NAMGEM")
+        return {"name": name}
+    lor = next((str(props[k]) for k in ("BZR_ID", "bzr_id", "BZR", "spatial_name", "SCHLUESSEL") if props.get(k)), None)
+    name = next((props[k] for k in ("BZR_NAME", "bzr_name", "NAME", "name") if props.get(k)), None)
+    if lor is not None and lor.isdigit(): lor = lor.zfill(6)
+    return {"name": name, "lor": lor}
+
+
+def build_levels(kind, source_geojson):
+    features = [
+        {"type": "Feature", "properties": _normalize_properties(kind, f.get("properties") or {}), "geometry": f["geometry"]}
+        for f in source_geojson["features"] if f.get("geometry")
+    ]
+    return {
+        level: {
+            "type": "FeatureCollection",
+            "features": [dict(f, geometry=simplify_geometry(f["geometry"], tol, digits)) for f in features],
+        }
+        for level, (tol, digits) in LEVELS.items()
+    }
+
+
+def _fetch_source(kind):
+    local = os.path.join(GEO_DIR, f"{kind}.source.geojson")
+    if os.path.exists(local):
+        with open(local, encoding="utf-8") as f: return json.load(f)
+    return requests.get(SOURCES[kind], timeout=30).json()
+
+
+def write_levels(kind, out_dir, source=None):
+    os.makedirs(out_dir, exist_ok=True)
+    for level, fc in build_levels(kind, source or _fetch_source(kind)).items():
+        tmp = os.path.join(out_dir, f"{kind}.{level}.geojson.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(fc, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, os.path.join(out_dir, f"{kind}.{level}.geojson"))
+
+
+def _local_path(kind, level):
+    for d in (GEO_DIR, GEO_CACHE_DIR):
+        path = os.path.join(d, f"{kind}.{level}.geojson")
+        if os.path.exists(path): return path
+    return None
+
+
+def has_local(kind, level="medium"):
+    # 네트워크 없이 바로 쓸 수 있는 경계 파일이 있는지
+    return _local_path(kind, level) is not None
+
+
+@lru_cache(maxsize=None)
+def _load(kind, level):
+    # 우선순위: 저장소에 포함된 geo/ -> 로컬 캐시 -> (없으면) 원본 받아서 캐시에 생성
+    path = _local_path(kind, level)
+    if path:
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    with _BUILD_LOCK:
+        path = os.path.join(GEO_CACHE_DIR, f"{kind}.{level}.geojson")
+        if not os.path.exists(path):
+            write_levels(kind, GEO_CACHE_DIR)
+        with open(path, encoding="utf-8") as f: return json.load(f)
+
+
+def get_boundaries(kind="bezirk", level="medium", allow_fetch=True):
+    # folium이 렌더링할 때 feature에 style을 써 넣으므로, 공유 캐시 대신 얕은 복사본을 넘긴다
+    # (좌표 배열은 공유 -> 복사 비용은 feature 수에 비례)
+    # allow_fetch=False: 로컬 파일이 없으면 네트워크를 쓰지 않고 None
+    if not allow_fetch and _local_path(kind, level) is None: return None
+    if time.time() - _FAILED.get(kind, 0) < RETRY_AFTER_S: return None
+    try:
+        fc = _load(kind, level)
+    except Exception:
+        _FAILED[kind] = time.time()
+        return None
+    return {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": dict(f["properties"]), "geometry": f["geometry"]} for f in fc["features"]],
+    }
+
+
+def prefetch(kind):
+    # 화면을 그리는 경로(get_boundaries(allow_fetch=False))에서는 받지 않는다:
+    # 로컬 파일이 없으면 뒤에서 한 번만 원본을 받아 캐시에 만들어 두고, 다음 rerun부터 쓴다
+    if _local_path(kind, "medium") is not None: return
+    if time.time() - _FAILED.get(kind, 0) < RETRY_AFTER_S: return
+    with _PREFETCH_LOCK:
+        if kind in _PREFETCHING: return
+        _PREFETCHING.add(kind)
+    fetch_layer.submit(_prefetch, kind)
+
+
+def _prefetch(kind):
+    try:
+        _load(kind, "medium")
+    except Exception:
+        _FAILED[kind] = time.time()
+    finally:
+        with _PREFETCH_LOCK: _PREFETCHING.discard(kind)
+
+
+def centroid(geom):
+    # 면적 가중 중심점 (가장 큰 폴리곤 외곽선 기준) -> (lat, lng)
+    polys = [geom["coordinates"]] if geom["type"] == "Polygon" else geom["coordinates"]
+    best, best_area = None, -1.0
+    for poly in polys:
+        pts = np.asarray(poly[0], dtype=float)[:, :2]
+        x, y = pts[:, 0], pts[:, 1]
+        cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+        area = cross.sum() / 2
+        if abs(area) > best_area:
+            best_area = abs(area)
+            if area == 0:
+                best = (y.mean(), x.mean())
+            else:
+                best = (((y[:-1] + y[1:]) * cross).sum() / (6 * area), ((x[:-1] + x[1:]) * cross).sum() / (6 * area))
+    return best
+
+
+if __name__ == "__main__":
+    # 저장소용 경계 파일 생성: python geo_data.py
+    for kind in SOURCES:
+        write_levels(kind, GEO_DIR)
+        sizes = {lv: os.path.getsize(os.path.join(GEO_DIR, f"{kind}.{lv}.geojson")) // 1024 for lv in LEVELS}
+        print(kind, sizes, "KB")
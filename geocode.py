@@ -0,0 +1,172 @@
+import re
+import time
+import threading
+import unicodedata
+from concurrent.futures import Future
+from functools import lru_cache
+
+import requests
+
+import crime_panel
+import geo_data
+import shared_cache
+from courses import courses
+from crime_data import BERLIN_DISTRICTS
+
+# ---------------------------------------------------------
+# 장소 검색(지오코딩): 로컬 지명 사전 -> 영구 캐시 -> Nominatim
+# ---------------------------------------------------------
+# Streamlit은 위젯을 누를 때마다 스크립트 전체를 다시 실행하므로
+# 검색창에 글자가 남아 있으면 매번 Nominatim을 호출하게 된다.
+# - 자주 쓰는 지명(베를린, 구, 범죄 통계의 권역(Bezirksregion), 코스 장소)은 네트워크 없이 바로 응답
+# - 나머지는 정규화한 질의어로 공유 디스크 캐시(shared_cache)에 보관
+# - 같은 질의의 동시 요청은 한 번만, Nominatim 정책(초당 1회)에 맞춰 속도 제한
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+BERLIN_CENTER = (52.5200, 13.4050)
+USER_AGENT = "BerlinApp/1.0"
+HIT_TTL_S = 30 * 24 * 3600
+MISS_TTL_S = 24 * 3600
+MIN_INTERVAL_S = 1.0
+
+# 구 이름을 이루는 동네(Ortsteil) 중심 좌표 (경계 데이터 없이도 동작하도록 내장)
+ORTSTEILE = {
+    "Mitte": (52.5176, 13.4017), "Friedrichshain": (52.5158, 13.4545), "Kreuzberg": (52.4986, 13.4030),
+    "Pankow": (52.5693, 13.4010), "Charlottenburg": (52.5167, 13.3000), "Wilmersdorf": (52.4870, 13.3200),
+    "Spandau": (52.5350, 13.2000), "Steglitz": (52.4560, 13.3220), "Zehlendorf": (52.4340, 13.2590),
+    "Tempelhof": (52.4660, 13.3850), "Schöneberg": (52.4830, 13.3530), "Neukölln": (52.4810, 13.4350),
+    "Treptow": (52.4930, 13.4600), "Köpenick": (52.4450, 13.5760), "Marzahn": (52.5450, 13.5600),
+    "Hellersdorf": (52.5360, 13.6040), "Lichtenberg": (52.5150, 13.4990), "Reinickendorf": (52.5890, 13.3290),
+}
+
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+_RATE_LOCK = threading.Lock()
+_LAST_REQUEST = [0.0]
+
+
+def normalize_query(query):
+    # 대소문자/유니코드/움라우트 표기/공백/구두점 차이를 없애고 끝의 "Berlin"은 떼어낸다
+    # (질의가 "Berlin" 하나뿐이면 그대로 둔다)
+    q = unicodedata.normalize("NFKC", str(query)).casefold()
+    q = q.replace("ä", "ae").replace("ö", "oe").replace("ü", "ue")
+    q = re.sub(r"[^\w\s/-]", " ", q)
+    q = re.sub(r"\s+", " ", q).strip()
+    stripped = re.sub(r"(,?\s*berlin)+$", "", q).strip()
+    return stripped or ("berlin" if q else "")
+
+
+def _course_key(name):
+    # "3. Cafe am Neuen See (점심)" -> "cafe am neuen see"
+    return normalize_query(re.sub(r"\(.*?\)", "", re.sub(r"^\d+\.\s*", "", name)))
+
+
+def _region_names():
+    # 범죄 통계에 나오는 LOR 권역(Bezirksregion) -> [(lor, 권역 이름)] (가장 최근 연도 기준)
+    years = crime_panel.available_years()
+    if not years: return []
+    panel = crime_panel.load_year(years[-1])
+    d = panel[panel['level'] == 'region'].drop_duplicates('lor')
+    return [(lor, name) for lor, name in zip(d['lor'], d['region']) if isinstance(name, str)]
+
+
+def gazetteer():
+    # 권역 경계 파일이 나중에 생기면(백그라운드로 받은 뒤 등) 권역 좌표를 더 정확한 것으로 다시 만든다
+    return _build_gazetteer(geo_data.has_local("region", "low"))
+
+
+@lru_cache(maxsize=2)
+def _build_gazetteer(with_boundaries):
+    # 정규화한 이름 -> (lat, lng, 표시 이름). 나중에 넣은 항목이 우선
+    entries = {"berlin": (*BERLIN_CENTER, "Berlin")}
+    for part, (lat, lng) in ORTSTEILE.items():
+        entries[normalize_query(part)] = (lat, lng, f"{part}, Berlin")
+    for district in BERLIN_DISTRICTS:
+        parts = [ORTSTEILE[p] for p in district.split("-") if p in ORTSTEILE]
+        if parts:
+            lat = sum(p[0] for p in parts) / len(parts)
+            lng = sum(p[1] for p in parts) / len(parts)
+            entries[normalize_query(district)] = (lat, lng, f"{district}, Berlin")
+    # LOR 권역 이름은 범죄 통계에서, 좌표는 로컬 권역 경계의 중심에서.
+    # 경계가 없는 권역은 넣지 않는다 -> 구 중심 같은 근사 좌표(수 km 오차)를 정답처럼 돌려주지 않고 캐시/Nominatim으로
+    centers = {}
+    regions = geo_data.get_boundaries("region", "low", allow_fetch=False) if with_boundaries else None
+    for f in (regions or {}).get("features", []):
+        if f["properties"].get("lor"): centers[f["properties"]["lor"]] = geo_data.centroid(f["geometry"])
+    try:
+        region_names = _region_names() if centers else []
+    except Exception:
+        region_names = []
+    for lor, name in region_names:
+        key = normalize_query(name)
+        if key in entries or lor not in centers: continue
+        lat, lng = centers[lor]
+        entries[key] = (float(lat), float(lng), f"{name}, Berlin")
+    for stops in courses.values():
+        for stop in stops:
+            entries[_course_key(stop["name"])] = (stop["lat"], stop["lng"], stop["name"])
+    return entries
+
+
+# [영구 캐시] 공유 디스크 캐시 (여러 세션/레플리카가 같이 씀). 못 찾은 결과도 짧게 기억
+def _cache_get(key):
+    hit = shared_cache.get_backend().get("geocode", key)
+    return None if hit is None else tuple(hit[0])
+
+
+def _cache_put(key, result):
+    ttl = HIT_TTL_S if result[0] is not None else MISS_TTL_S
+    shared_cache.get_backend().set("geocode", key, tuple(result), ttl)
+
+
+def _rate_limited_get(params):
+    with _RATE_LOCK:
+        wait = _LAST_REQUEST[0] + MIN_INTERVAL_S - time.time()
+        if wait > 0: time.sleep(wait)
+        _LAST_REQUEST[0] = time.time()
+    return requests.get(NOMINATIM_URL, params=params, headers={'User-Agent': USER_AGENT}, timeout=10).json()
+
+
+def parse_nominatim(res):
+    # Nominatim 응답(JSON 목록) -> (lat, lng, 이름)
+    if res: return float(res[0]['lat']), float(res[0]['lon']), res[0]['display_name']
+    return None, None, None
+
+
+def nominatim_search(query):
+    return parse_nominatim(_rate_limited_get({'q': query, 'format': 'json', 'limit': 1}))
+
+
+fetch_geocode = nominatim_search
+
+
+def _lookup(key, query):
+    cached = _cache_get(key)
+    if cached is not None: return cached
+    result = fetch_geocode(query)
+    _cache_put(key, result)
+    return result
+
+
+def search_location(query):
+    key = normalize_query(query)
+    if not key: return None, None, None
+    hit = gazetteer().get(key)
+    if hit: return hit
+
+    # 같은 질의가 이미 진행 중이면 그 결과를 기다린다 (request coalescing)
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        owner = fut is None
+        if owner:
+            fut = _INFLIGHT[key] = Future()
+    if not owner:
+        return fut.result()
+    try:
+        result = _lookup(key, query)
+    except Exception:
+        result = (None, None, None)  # 네트워크 오류는 캐시하지 않는다
+    finally:
+        with _INFLIGHT_LOCK: _INFLIGHT.pop(key, None)
+    fut.set_result(result)
+    return result
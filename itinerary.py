@@ -0,0 +1,133 @@
+from functools import lru_cache
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 도보 거리 행렬 + 방문 순서 최적화
+# ---------------------------------------------------------
+# - 거리: 하버사인 직선거리 × 도보 우회 계수 (도로망 없이 근사)
+# - 순서: 장소가 적으면 Held-Karp DP로 정확한 최적, 많으면 최근접 이웃 + 2-opt
+# - 첫 장소를 출발점으로 고정하고 돌아오지 않는 경로(열린 경로) 기준
+
+EARTH_RADIUS_M = 6371000.0
+DETOUR_FACTOR = 1.3       # 직선거리 대비 실제 도보 거리 (도심 평균)
+WALK_SPEED_M_PER_MIN = 80  # 4.8 km/h
+EXACT_MAX_STOPS = 12       # 2^n × n 상태 -> 12개까지는 즉시 계산
+
+
+def _key(points):
+    # 메모이제이션 키: 좌표를 약 1m 단위로 반올림
+    return tuple((round(float(lat), 5), round(float(lng), 5)) for lat, lng in points)
+
+
+@lru_cache(maxsize=256)
+def _matrix(key):
+    pts = np.radians(np.array(key, dtype=float).reshape(-1, 2))
+    lat, lng = pts[:, 0], pts[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    d = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * DETOUR_FACTOR
+    d.setflags(write=False)  # 캐시 공유 배열이므로 읽기 전용
+    return d
+
+
+def walking_matrix(points):
+    # points: [(lat, lng), ...] -> (n, n) 도보 거리 [m]
+    if len(points) == 0: return np.zeros((0, 0))
+    return _matrix(_key(points))
+
+
+def route_length(dist, order):
+    order = list(order)
+    return float(sum(dist[a, b] for a, b in zip(order[:-1], order[1:])))
+
+
+def _held_karp(dist):
+    # 0번에서 출발해 모든 장소를 한 번씩 방문하는 최단 열린 경로 (정확해)
+    n = len(dist)
+    full = 1 << n
+    dp = np.full((full, n), np.inf)
+    parent = np.full((full, n), -1, dtype=int)
+    dp[1, 0] = 0.0
+    for mask in range(1, full, 2):  # 출발점(0)이 포함된 부분집합만
+        row = dp[mask]
+        if not np.isfinite(row).any(): continue
+        # row[j] + dist[j, k] 를 모든 (j, k)에 대해 한 번에 계산
+        cand = row[:, None] + dist
+        best_prev = np.argmin(cand, axis=0)
+        best = cand[best_prev, np.arange(n)]
+        for k in range(1, n):
+            if mask & (1 << k): continue
+            nxt = mask | (1 << k)
+            if best[k] < dp[nxt, k]:
+                dp[nxt, k] = best[k]
+                parent[nxt, k] = best_prev[k]
+    mask = full - 1
+    last = int(np.argmin(dp[mask]))
+    order = []
+    while last != -1:
+        order.append(int(last))
+        prev = parent[mask, last]
+        mask ^= 1 << last
+        last = prev
+    return order[::-1]
+
+
+def _nearest_neighbor(dist):
+    n = len(dist)
+    order, visited = [0], np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        d = np.where(visited, np.inf, dist[order[-1]])
+        nxt = int(np.argmin(d))
+        order.append(nxt); visited[nxt] = True
+    return order
+
+
+def _two_opt(dist, order, max_rounds=50):
+    # 구간 뒤집기로 더 짧아지면 반영 (출발점 고정, 열린 경로)
+    order = np.array(order)
+    n = len(order)
+    for _ in range(max_rounds):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            # 뒤집을 구간 끝 j 후보 전체를 한 번에 평가
+            js = np.arange(i + 1, n)
+            c = order[js]
+            d_next = np.append(order[js[:-1] + 1], -1)
+            old = dist[a, b] + np.where(d_next >= 0, dist[c, np.maximum(d_next, 0)], 0)
+            new = dist[a, c] + np.where(d_next >= 0, dist[b, np.maximum(d_next, 0)], 0)
+            gain = old - new
+            j = int(np.argmax(gain))
+            if gain[j] > 1e-9:
+                order[i:js[j] + 1] = order[i:js[j] + 1][::-1]
+                improved = True
+        if not improved: break
+    return order.tolist()
+
+
+def optimize_order(points):
+    # -> (방문 순서 인덱스 목록, 총 도보 거리[m]). 첫 장소는 출발점으로 고정
+    n = len(points)
+    if n <= 2: return list(range(n)), (route_length(walking_matrix(points), range(n)) if n else 0.0)
+    dist = walking_matrix(points)
+    if n <= EXACT_MAX_STOPS:
+        order = _held_karp(dist)
+    else:
+        order = _two_opt(dist, _nearest_neighbor(dist))
+    return order, route_length(dist, order)
+
+
+def walking_minutes(meters):
+    return meters / WALK_SPEED_M_PER_MIN
+
+
+def leg_summary(points, order):
+    # 구간별 거리/시간 목록
+    dist = walking_matrix(points)
+    return [
+        {"from": a, "to": b, "m": float(dist[a, b]), "min": walking_minutes(dist[a, b])}
+        for a, b in zip(order[:-1], order[1:])
+    ]
@@ -0,0 +1,211 @@
+import threading
+from html import escape
+from collections import OrderedDict
+
+import numpy as np
+import folium
+from branca.element import Element, CssLink, JavascriptLink
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+
+# ---------------------------------------------------------
+# 장소 마커 레이어 렌더링
+# ---------------------------------------------------------
+# 장소 수천 개를 folium.Marker로 하나씩 만들면 DOM 마커 수천 개 + 거대한 HTML이 된다.
+# 빠른 모드: 좌표/이름만 배열로 보내고 브라우저에서 클러스터링(FastMarkerCluster),
+# 팝업 HTML은 클릭할 때 만든다. 화면 밖 장소는 보내지 않고, 레이어당 개수 상한을 둔다.
+
+MAX_MARKERS_PER_LAYER = 1500
+VIEWPORT_PADDING = 0.25  # 화면 밖 여유 (화면 크기 대비 비율) - 살짝 움직여도 빈 곳이 보이지 않도록
+RENDER_CACHE_SIZE = 32   # 정적 레이어 / 완성된 지도 HTML 캐시 개수 (LRU)
+
+_POPUP_CALLBACK = """
+    var esc = function(s) {
+        return String(s).replace(/[&<>"']/g, function(c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    };
+    var callback = function(row) {
+        var icon = L.AwesomeMarkers.icon({icon: '%(icon)s', prefix: 'fa', markerColor: '%(color)s'});
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+        marker.bindPopup(function() {
+            var risk = row[5] ? "<br><small>범죄 위험도: " + esc(row[5]) + "</small>" : "";
+            return "<div style='width:150px'><b>" + esc(row[2]) + "</b><br><span style='color:grey'>" + esc(row[3]) +
+                   "</span>" + risk + "<br><a href='" + esc(encodeURI(row[4])) + "' target='_blank'>구글 검색</a></div>";
+        });
+        return marker;
+    };
+"""
+
+
+def bounds_from_state(map_state):
+    # st_folium 반환값의 bounds -> (south, west, north, east)
+    try:
+        b = map_state['bounds']
+        sw, ne = b['_southWest'], b['_northEast']
+        if sw['lat'] is None or ne['lat'] is None: return None
+        return (sw['lat'], sw['lng'], ne['lat'], ne['lng'])
+    except (KeyError, TypeError):
+        return None
+
+
+def cull_places(places, center, bounds=None, max_points=MAX_MARKERS_PER_LAYER):
+    # 화면(+여유) 밖 장소 제거, 그래도 많으면 중심에서 가까운 순으로 max_points개만
+    if not places: return places
+    lat = np.fromiter((p['lat'] for p in places), float, len(places))
+    lng = np.fromiter((p['lng'] for p in places), float, len(places))
+    keep = np.ones(len(places), dtype=bool)
+    if bounds:
+        s, w, n, e = bounds
+        pad_lat, pad_lng = (n - s) * VIEWPORT_PADDING, (e - w) * VIEWPORT_PADDING
+        keep = (lat >= s - pad_lat) & (lat <= n + pad_lat) & (lng >= w - pad_lng) & (lng <= e + pad_lng)
+    idx = np.flatnonzero(keep)
+    if len(idx) > max_points:
+        d2 = (lat[idx] - center[0]) ** 2 + ((lng[idx] - center[1]) * np.cos(np.radians(center[0]))) ** 2
+        idx = idx[np.argsort(d2, kind="stable")[:max_points]]
+    return [places[i] for i in idx]
+
+
+class _HideLayer(folium.MacroElement):
+    # FastMarkerCluster 템플릿은 show 값과 상관없이 지도에 붙으므로, 뒤에서 떼어 낸다
+    _template = Template("{% macro script(this, kwargs) %}{{ this._parent.get_name() }}.removeLayer({{ this.layer.get_name() }});{% endmacro %}")
+
+    def __init__(self, layer):
+        super().__init__()
+        self.layer = layer
+
+
+def add_place_layer(m, places, name, color, icon, fast=True, show=True):
+    # show=False: 레이어는 보내되 처음에는 숨김 (LayerControl로 켬)
+    if fast:
+        data = [[p['lat'], p['lng'], p['name'], p['desc'], p['link'], p.get('badge', "")] for p in places]
+        cluster = FastMarkerCluster(
+            data, callback=_POPUP_CALLBACK % {'icon': icon, 'color': color}, name=name, show=show,
+            options={'disableClusteringAtZoom': 17, 'chunkedLoading': True},
+        ).add_to(m)
+        if not show: _HideLayer(cluster).add_to(m)
+        return
+    fg = folium.FeatureGroup(name=name, show=show)
+    for p in places:
+        risk = f"<br><small>범죄 위험도: {escape(p['badge'])}</small>" if p.get('badge') else ""
+        html = f"""<div style='width:150px'><b>{escape(p['name'])}</b><br><span style='color:grey'>{escape(p['desc'])}</span>{risk}<br><a href='{escape(p['link'])}' target='_blank'>구글 검색</a></div>"""
+        folium.Marker([p['lat'], p['lng']], popup=html, icon=folium.Icon(color=color, icon=icon, prefix='fa')).add_to(fg)
+    fg.add_to(m)
+
+
+# ---------------------------------------------------------
+# 정적 레이어 / 지도 HTML 캐시
+# ---------------------------------------------------------
+# 범죄 Choropleth처럼 입력이 같으면 결과도 같은 레이어를 매번 새로 만들고 직렬화하면
+# (GeoJSON 수 MB -> JS 문자열 -> jinja 템플릿 컴파일) 재실행마다 수백 ms가 든다.
+# 한 번 렌더링한 JS를 키별로 보관해 두고, 지도에는 그 문자열만 끼워 넣는다.
+
+_SCRATCH_ID = "static0render0scratch"
+_RENDER_CACHE = OrderedDict()
+_RENDER_LOCK = threading.Lock()
+_RENDER_STATS = {"hits": 0, "misses": 0}
+
+
+class _RawScript(Element):
+    # 이미 렌더링된 JS: 템플릿으로 다시 컴파일하지 않고 그대로 내보낸다
+    def __init__(self, text):
+        super().__init__()
+        self.text = text
+
+    def render(self, **kwargs):
+        return self.text
+
+
+class StaticLayer(JSCSSMixin, Layer):
+    # 미리 렌더링한 레이어 JS를 지도에 붙이는 요소 (st_folium / get_root().render() 둘 다 지원)
+    _template = Template("{% macro script(this, kwargs) %}{{ this.script_for_parent() }}{% endmacro %}")
+
+    def __init__(self, rendered, name=None, overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._rendered = rendered
+        self.default_js = list(rendered["js"])
+        self.default_css = list(rendered["css"])
+
+    def get_name(self):
+        # 캐시된 JS 안의 레이어 변수 이름 (LayerControl 등에서 참조)
+        return self._rendered["var"]
+
+    def script_for_parent(self):
+        parent = self._parent.get_name()
+        script = self._rendered["script"].replace(self._rendered["map"], parent)
+        if not self.show:  # 캐시된 JS는 항상 지도에 추가하므로, 숨김이면 바로 뗀다
+            script += f"\n{parent}.removeLayer({self.get_name()});"
+        return script
+
+    def render(self, **kwargs):
+        figure = self.get_root()
+        for name, url in self.default_js:
+            figure.header.add_child(JavascriptLink(url), name=name)
+        for name, url in self.default_css:
+            figure.header.add_child(CssLink(url), name=name)
+        figure.script.add_child(_RawScript(self.script_for_parent()), name=self.get_name())
+
+
+def _cache_get_or_build(key, build):
+    with _RENDER_LOCK:
+        if key in _RENDER_CACHE:
+            _RENDER_CACHE.move_to_end(key)
+            _RENDER_STATS["hits"] += 1
+            return _RENDER_CACHE[key]
+        _RENDER_STATS["misses"] += 1
+    value = build()  # 락 밖에서 (같은 키가 동시에 만들어져도 결과는 같다)
+    if value is None: return None  # 실패는 캐시하지 않음
+    with _RENDER_LOCK:
+        _RENDER_CACHE[key] = value
+        _RENDER_CACHE.move_to_end(key)
+        while len(_RENDER_CACHE) > RENDER_CACHE_SIZE:
+            _RENDER_CACHE.popitem(last=False)
+    return value
+
+
+def _render_layer(build):
+    # 빈 지도에 레이어 하나를 그려 보고, 새로 생긴 script/header 항목만 떼어 낸다
+    scratch = folium.Map(tiles=None)
+    scratch._id = _SCRATCH_ID
+    fig = scratch.get_root()
+    fig.render()
+    base_script, base_header = set(fig.script._children), set(fig.header._children)
+    layer = build(scratch)
+    if layer is None: return None
+    fig.render()
+    script = "\n".join(el.render() for k, el in fig.script._children.items() if k not in base_script)
+    new_header = [(k, el) for k, el in fig.header._children.items() if k not in base_header]
+    return {
+        "script": script, "var": layer.get_name(), "map": scratch.get_name(),
+        "js": [(k, el.url) for k, el in new_header if isinstance(el, JavascriptLink)],
+        "css": [(k, el.url) for k, el in new_header if isinstance(el, CssLink)],
+    }
+
+
+def add_static_layer(m, key, build, name=None, show=True):
+    # build(m) -> 지도에 레이어 하나를 추가하고 그 레이어를 반환 (실패 시 None)
+    # 같은 key면 처음 한 번만 build하고 이후에는 렌더링 결과를 재사용한다
+    rendered = _cache_get_or_build(("layer", key), lambda: _render_layer(build))
+    if rendered is None: return None
+    return StaticLayer(rendered, name=name, show=show).add_to(m)
+
+
+def cached_map_html(key, build):
+    # 지도 전체가 key로 결정될 때: 완성된 HTML 문서를 통째로 캐시 (st.components.v1.html로 표시)
+    # build()가 None이면(레이어 일부 실패 등) 캐시하지 않고 None
+    def render():
+        m = build()
+        return None if m is None else m.get_root().render()
+    return _cache_get_or_build(("html", key), render)
+
+
+def render_cache_stats():
+    with _RENDER_LOCK:
+        return dict(_RENDER_STATS, entries=len(_RENDER_CACHE))
+
+
+def render_cache_clear():
+    with _RENDER_LOCK:
+        _RENDER_CACHE.clear()
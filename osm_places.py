@@ -0,0 +1,306 @@
+import re
+import math
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+import requests
+
+import fetch_layer
+import shared_cache
+
+# ---------------------------------------------------------
+# OSM(Overpass) 장소 검색 - 타일 단위 캐시 + 격자 공간 인덱스
+# ---------------------------------------------------------
+# 지도 중심이 조금만 움직여도 새 Overpass 요청을 보내던 문제를 없애기 위해
+# 원본 요소(element)를 고정 격자 타일 단위로 보관한다.
+# 어떤 중심/반경으로 검색하든 겹치는 타일에서 답을 만들고, 없는 타일만 받아온다.
+
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+OVERPASS_TIMEOUT_S = 15
+
+TILE_LAT = 0.02   # ≈ 2.2km
+TILE_LNG = 0.03   # ≈ 2.0km (베를린 위도 기준)
+TILE_TTL_S = 24 * 3600  # OSM 장소 데이터는 자주 바뀌지 않는다
+RETRY_AFTER_S = 60      # 요청 실패 후 재시도까지 대기 (rerun마다 15초씩 막히지 않도록)
+SHARED_TILE_TTL_S = 7 * 24 * 3600  # 공유 디스크 캐시 보관 기간 (TTL이 지난 타일도 새로 뜬 레플리카의 초기값으로는 쓴다)
+
+CATEGORY_TAGS = {
+    'restaurant': '["amenity"="restaurant"]',
+    'hotel': '["tourism"~"hotel|hostel|guest_house"]',
+    'tourism': '["tourism"~"attraction|museum|artwork|viewpoint"]',
+}
+
+EARTH_RADIUS_M = 6371000.0
+
+
+class _Tile:
+    __slots__ = ("category", "elements", "lat", "lng", "fetched_at", "_frame")
+
+    def __init__(self, category, elements, fetched_at):
+        self.category = category
+        self.elements = elements
+        self.lat = np.array([e['lat'] for e in elements], dtype=float)
+        self.lng = np.array([e['lon'] for e in elements], dtype=float)
+        self.fetched_at = fetched_at
+        self._frame = None
+
+    @property
+    def frame(self):
+        # 분류는 타일을 받은 뒤 처음 필요할 때 한 번만
+        if self._frame is None:
+            self._frame = classify_elements(self.elements, self.category)
+        return self._frame
+
+
+# 한 번의 union 쿼리로 여러 카테고리를 받은 뒤, 태그로 다시 나누기 위한 조건 (위 Overpass 조건과 동일)
+CATEGORY_MATCH = {
+    'restaurant': ('amenity', re.compile(r'^restaurant$')),
+    'hotel': ('tourism', re.compile(r'hotel|hostel|guest_house')),
+    'tourism': ('tourism', re.compile(r'attraction|museum|artwork|viewpoint')),
+}
+
+# category -> {(ti, tj): _Tile}
+_TILES = {c: {} for c in CATEGORY_TAGS}
+_FETCH_LOCK = threading.Lock()  # 동시에 같은 타일을 두 번 받지 않도록 네트워크 요청은 하나씩
+_REFRESHING = set()             # 백그라운드 갱신 중인 (category, tile)
+_FAILED_AT = [0.0]
+
+
+def overpass_fetch(query):
+    response = requests.get(OVERPASS_URL, params={'data': query}, timeout=OVERPASS_TIMEOUT_S)
+    if response.status_code != 200: return None
+    return response.json()
+
+
+fetch_overpass = overpass_fetch
+
+_BBOX_RE = re.compile(r"\(([-\d.]+,[-\d.]+,[-\d.]+,[-\d.]+)\)")  # 쿼리 안의 (s,w,n,e)
+
+
+def replay_overpass(elements):
+    # 미리 받아 둔 요소 목록으로 답하는 fetch_overpass 대용 (오프라인 벤치마크/테스트)
+    # 쿼리 안의 bbox들에 들어가는 요소만 돌려준다 -> 실제 Overpass처럼 요청한 타일만 채워진다
+    def fetch(query):
+        boxes = [tuple(map(float, b.split(","))) for b in _BBOX_RE.findall(query)]
+        return {"elements": [e for e in elements if any(s <= e["lat"] <= n and w <= e["lon"] <= ea for s, w, n, ea in boxes)]}
+    return fetch
+
+
+def tile_of(lat, lng):
+    return (math.floor(lat / TILE_LAT), math.floor(lng / TILE_LNG))
+
+
+def tile_bbox(tile):
+    ti, tj = tile
+    return (ti * TILE_LAT, tj * TILE_LNG, (ti + 1) * TILE_LAT, (tj + 1) * TILE_LNG)
+
+
+def tiles_for_radius(lat, lng, radius_m):
+    # 원과 겹치는 타일만 (사각 bbox 모서리 타일 제외)
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    t0, t1 = tile_of(lat - dlat, lng - dlng), tile_of(lat + dlat, lng + dlng)
+    tiles = []
+    for ti in range(t0[0], t1[0] + 1):
+        for tj in range(t0[1], t1[1] + 1):
+            s, w, n, e = tile_bbox((ti, tj))
+            near_lat, near_lng = min(max(lat, s), n), min(max(lng, w), e)
+            if haversine_m(lat, lng, near_lat, near_lng) <= radius_m:
+                tiles.append((ti, tj))
+    return tiles
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def build_tile_query(wanted):
+    # wanted: {category: [tile, ...]} -> 하나의 union 쿼리
+    parts = "".join(
+        f"node{CATEGORY_TAGS[c]}({s:.5f},{w:.5f},{n:.5f},{e:.5f});"
+        for c, tiles in wanted.items() for s, w, n, e in map(tile_bbox, tiles)
+    )
+    return f"[out:json][timeout:{OVERPASS_TIMEOUT_S}];({parts});out body;"
+
+
+def _element_categories(el):
+    tags = el.get('tags') or {}
+    return [c for c, (key, pattern) in CATEGORY_MATCH.items() if pattern.search(tags.get(key, ''))]
+
+
+def _fetch_tiles(wanted):
+    data = fetch_overpass(build_tile_query(wanted))
+    if data is None or 'elements' not in data: return False
+    buckets = {c: {t: [] for t in tiles} for c, tiles in wanted.items()}
+    for el in data['elements']:
+        if 'lat' not in el or 'lon' not in el: continue
+        t = tile_of(el['lat'], el['lon'])
+        for c in _element_categories(el):
+            # 경계에 걸린 요소는 이웃 타일을 받을 때 들어온다
+            if c in buckets and t in buckets[c]: buckets[c][t].append(el)
+    now = time.time()
+    backend = shared_cache.get_backend()
+    for c, tiles in buckets.items():
+        for t, elements in tiles.items():
+            _TILES[c][t] = _Tile(c, elements, now)
+            backend.set("osm_tile", _shared_key(c, t), elements, SHARED_TILE_TTL_S)
+    return True
+
+
+def _shared_key(category, tile):
+    return f"{category}:{tile[0]}:{tile[1]}"
+
+
+def _adopt_shared(wanted, newer_than=None):
+    # 다른 프로세스가 공유 캐시에 받아 둔 타일을 가져온다 -> 여전히 받아야 하는 {category: [tile]}
+    # newer_than: 이미 있는 타일은 공유 캐시 쪽이 더 새것일 때만 교체
+    backend = shared_cache.get_backend()
+    remaining = {}
+    for c, tiles in wanted.items():
+        for t in tiles:
+            hit = backend.get("osm_tile", _shared_key(c, t))
+            if hit is not None and (newer_than is None or hit[1] > newer_than):
+                _TILES[c][t] = _Tile(c, hit[0], hit[1])
+            else:
+                remaining.setdefault(c, []).append(t)
+    return remaining
+
+
+def _refresh_tiles(wanted):
+    try:
+        with _FETCH_LOCK, shared_cache.lease("osm_tile", "overpass", wait=OVERPASS_TIMEOUT_S):
+            remaining = _adopt_shared(wanted, newer_than=time.time() - TILE_TTL_S)
+            if remaining: _fetch_tiles(remaining)
+    except Exception:
+        pass
+    finally:
+        # 공유 캐시에서 가져온 타일도 포함해 요청한 타일 전부를 갱신 중 목록에서 뺀다
+        for c, tiles in wanted.items():
+            _REFRESHING.difference_update((c, t) for t in tiles)
+
+
+def ensure_tiles(categories, lat, lng, radius_m):
+    # 여러 카테고리의 빠진 타일을 한 번의 요청으로 받는다.
+    # 만료된 타일은 일단 그대로 쓰고 백그라운드에서 갱신 (stale-while-revalidate)
+    tiles = tiles_for_radius(lat, lng, radius_m)
+    now = time.time()
+    categories = [c for c in categories if c in CATEGORY_TAGS]
+    stale = {}
+    for c in categories:
+        old = [t for t in tiles if t in _TILES[c] and now - _TILES[c][t].fetched_at > TILE_TTL_S and (c, t) not in _REFRESHING]
+        if old:
+            stale[c] = old
+            _REFRESHING.update((c, t) for t in old)
+    if stale:
+        fetch_layer.submit(_refresh_tiles, stale)
+
+    if not any(t not in _TILES[c] for c in categories for t in tiles): return
+    if now - _FAILED_AT[0] < RETRY_AFTER_S: return
+    # Overpass 호출은 프로세스 안에서는 _FETCH_LOCK, 레플리카 사이에서는 공유 캐시 lease로 하나씩
+    with _FETCH_LOCK, shared_cache.lease("osm_tile", "overpass", wait=OVERPASS_TIMEOUT_S):
+        # 락을 기다리는 동안 다른 세션/레플리카가 받아 두었을 수 있으니 다시 확인
+        missing = {c: [t for t in tiles if t not in _TILES[c]] for c in categories}
+        missing = _adopt_shared({c: ts for c, ts in missing.items() if ts})
+        if not missing: return
+        try:
+            ok = _fetch_tiles(missing)
+        except Exception:
+            ok = False
+        if not ok: _FAILED_AT[0] = time.time()
+
+
+def _tiles_for_query(category, lat, lng, radius_m):
+    # 반경과 겹치는 (캐시된) 타일 목록
+    ensure_tiles([category], lat, lng, radius_m)
+    cache = _TILES[category]
+    hits = [cache[t] for t in tiles_for_radius(lat, lng, radius_m) if t in cache]
+    return [t for t in hits if t.elements]
+
+
+def query_elements(category, lat, lng, radius_m):
+    # 반경 내 원본 OSM 요소
+    if category not in CATEGORY_TAGS: return []
+    hits = _tiles_for_query(category, lat, lng, radius_m)
+    if not hits: return []
+    lats = np.concatenate([t.lat for t in hits])
+    lngs = np.concatenate([t.lng for t in hits])
+    inside = np.flatnonzero(haversine_m(lat, lng, lats, lngs) <= radius_m)
+    elements = [e for t in hits for e in t.elements]
+    return [elements[i] for i in inside]
+
+
+def cache_stats():
+    return {c: {"tiles": len(t), "elements": sum(len(x.elements) for x in t.values())} for c, t in _TILES.items()}
+
+
+def clear_cache():
+    with _FETCH_LOCK:
+        for t in _TILES.values(): t.clear()
+
+
+# ---------------------------------------------------------
+# 원본 요소 -> 분류된 장소 표 (음식 종류 필터는 표에 대한 마스크)
+# ---------------------------------------------------------
+CUISINE_MAP = {
+    "한식": ["korean"], "양식": ["italian","french","german","american","burger","pizza","steak"],
+    "일식": ["japanese","sushi","ramen"], "중식": ["chinese","dim sum"],
+    "아시안": ["vietnamese","thai","asian","indian"], "카페": ["coffee","cafe","cake","bakery"]
+}
+# 종류별 키워드를 하나의 정규식으로 미리 컴파일 (부분 문자열 매칭, 위 순서대로 우선)
+_CUISINE_PATTERNS = [(k, re.compile("|".join(map(re.escape, v)))) for k, v in CUISINE_MAP.items()]
+CATEGORY_DESC = {'restaurant': "음식점", 'hotel': "숙박시설", 'tourism': "관광명소"}
+PLACE_COLUMNS = ["name", "lat", "lng", "type", "desc", "link", "cuisine_type"]
+
+
+def classify_elements(elements, category):
+    rows = [(e['tags'].get('name'), e['lat'], e['lon'], e['tags'].get('cuisine', 'general'))
+            for e in elements if 'tags' in e and e['tags'].get('name')]
+    df = pd.DataFrame(rows, columns=["name", "lat", "lng", "cuisine"])
+    if df.empty: return pd.DataFrame(columns=PLACE_COLUMNS)
+
+    cuisine_type = pd.Series("기타", index=df.index)
+    if category == 'restaurant':
+        raw = df['cuisine'].str.lower()
+        unassigned = pd.Series(True, index=df.index)
+        for k, pattern in _CUISINE_PATTERNS:
+            hit = unassigned & raw.str.contains(pattern)
+            cuisine_type[hit] = k
+            unassigned &= ~hit
+        df['desc'] = "음식점 (" + cuisine_type + ")"
+    else:
+        df['desc'] = CATEGORY_DESC.get(category, "장소")
+    df['cuisine_type'] = cuisine_type
+    df['type'] = category
+    df['link'] = "https://www.google.com/search?q=" + (df['name'] + " Berlin").str.replace(" ", "+", regex=False)
+    return df[PLACE_COLUMNS]
+
+
+def query_places(category, lat, lng, radius_m=3000):
+    # 반경 내 장소 표 (분류 완료). 필터와 무관하게 캐시된 데이터만 사용
+    if category not in CATEGORY_TAGS: return pd.DataFrame(columns=PLACE_COLUMNS)
+    frames = [t.frame for t in _tiles_for_query(category, lat, lng, radius_m)]
+    frames = [f for f in frames if not f.empty]
+    if not frames: return pd.DataFrame(columns=PLACE_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    return df[haversine_m(lat, lng, df['lat'].to_numpy(), df['lng'].to_numpy()) <= radius_m]
+
+
+def cuisine_mask(df, cuisine_filter):
+    # "전체"(또는 선택 없음)면 전부, 아니면 선택한 종류만. "기타" = 어느 종류에도 속하지 않는 곳
+    if not cuisine_filter or "전체" in cuisine_filter:
+        return pd.Series(True, index=df.index)
+    return df['cuisine_type'].isin(cuisine_filter)
+
+
+def get_osm_places(category, lat, lng, radius_m=3000, cuisine_filter=None):
+    try:
+        df = query_places(category, lat, lng, radius_m)
+        if category == 'restaurant':
+            df = df[cuisine_mask(df, cuisine_filter)]
+        return df.drop(columns="cuisine_type").to_dict("records")
+    except Exception:
+        return []
@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+# ---------------------------------------------------------
+# 단계별 시간 측정 (rerun 한 번 = run 하나)
+# ---------------------------------------------------------
+# - span("이름"): 그 구간 시간을 현재 run(스크립트 스레드)에 기록하고, 단계별 누적 통계에도 더한다
+# - start_run() / end_run(): rerun 시작과 끝. 끝난 run은 최근 RECENT_RUNS개만 보관
+# - BERLIN_PERF_LOG=1 이면 rerun마다 한 줄씩 로그 (logger "berlin.perf")
+# 백그라운드 스레드(병렬 호출 등)의 span은 현재 run에는 없고 누적 통계에만 들어간다
+
+RECENT_RUNS = 20
+LOG_ENABLED = os.environ.get("BERLIN_PERF_LOG") == "1"
+log = logging.getLogger("berlin.perf")
+if LOG_ENABLED and not log.handlers:
+    log.addHandler(logging.StreamHandler())
+    log.setLevel(logging.INFO)
+
+_local = threading.local()
+_LOCK = threading.Lock()
+_TOTALS = {}                     # 단계 -> [횟수, 합계(s), 최대(s)]
+_RECENT = deque(maxlen=RECENT_RUNS)
+
+
+def start_run(label=""):
+    _local.run = {"label": label, "started": time.perf_counter(), "spans": []}
+
+
+def record(name, seconds):
+    run = getattr(_local, "run", None)
+    if run is not None: run["spans"].append((name, seconds))
+    with _LOCK:
+        t = _TOTALS.setdefault(name, [0, 0.0, 0.0])
+        t[0] += 1; t[1] += seconds; t[2] = max(t[2], seconds)
+
+
+@contextmanager
+def span(name):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t)
+
+
+def timed(name=None):
+    # 함수 전체를 span으로 감싸는 데코레이터
+    def decorator(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label): return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def end_run():
+    # 현재 run을 닫고 {"label", "total", "spans"}를 돌려준다 (열린 run이 없으면 None)
+    run = getattr(_local, "run", None)
+    if run is None: return None
+    _local.run = None
+    done = {"label": run["label"], "total": time.perf_counter() - run["started"], "spans": run["spans"]}
+    with _LOCK: _RECENT.append(done)
+    if LOG_ENABLED:
+        log.info("rerun %s %.0fms | %s", done["label"], done["total"] * 1000,
+                 " ".join(f"{n}={s * 1000:.0f}" for n, s in done["spans"]))
+    return done
+
+
+def recent_runs():
+    with _LOCK: return list(_RECENT)
+
+
+def totals():
+    # 단계별 누적: {이름: {"count", "mean_ms", "max_ms"}}
+    with _LOCK:
+        return {n: {"count": c, "mean_ms": s * 1000 / c, "max_ms": m * 1000} for n, (c, s, m) in _TOTALS.items()}
+
+
+def reset():
+    with _LOCK:
+        _TOTALS.clear(); _RECENT.clear()
+
+
+def hit_rate(stats):
+    # 카운터 dict -> 적중률 (계산할 수 없으면 None)
+    hits = stats.get("hits", 0) + stats.get("stale", 0)
+    total = hits + stats.get("misses", 0)
+    return hits / total if total else None
@@ -0,0 +1,156 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import community
+import crime_data
+import spatial_join
+from courses import courses
+
+# ---------------------------------------------------------
+# AI 비서용 로컬 검색 (BM25)
+# ---------------------------------------------------------
+# 질문과 관련된 앱 데이터(코스 장소, 구별 범죄 통계, 후기/추천)를 몇 줄 골라
+# 프롬프트 앞에 붙인다 -> 모델이 앱의 데이터를 근거로 한 번에 답하고, 되묻는 횟수가 준다.
+# - 외부 서비스 없이 메모리 안의 역색인
+# - 한국어는 형태소 분석 없이 음절 bigram을 같이 넣어 "맛집추천" / "맛집" 같은 변형도 맞춘다
+# - 색인은 프로세스마다 한 번 만들고, 새 후기/추천은 마지막으로 본 id 이후만 추가
+
+K1, B = 1.5, 0.75
+TOP_K = 4
+MAX_CONTEXT_CHARS = 900  # 프롬프트에 붙일 자료 길이 상한
+_HANGUL = re.compile(r"[가-힣]")
+# 한국어 질문이 독일어 구 이름과도 맞도록 문서에 같이 넣는 한글 표기
+BEZIRK_KO = {
+    "Mitte": "미테", "Friedrichshain-Kreuzberg": "프리드리히스하인 크로이츠베르크", "Pankow": "판코",
+    "Charlottenburg-Wilmersdorf": "샤를로텐부르크 빌머스도르프", "Spandau": "슈판다우",
+    "Steglitz-Zehlendorf": "슈테글리츠 첼렌도르프", "Tempelhof-Schöneberg": "템펠호프 쇠네베르크",
+    "Neukölln": "노이쾰른", "Treptow-Köpenick": "트렙토 쾨페니크", "Marzahn-Hellersdorf": "마르찬 헬러스도르프",
+    "Lichtenberg": "리히텐베르크", "Reinickendorf": "라이니켄도르프",
+}
+
+
+def tokenize(text):
+    t = unicodedata.normalize("NFKC", str(text)).casefold()
+    t = t.replace("ä", "ae").replace("ö", "oe").replace("ü", "ue").replace("ß", "ss")
+    tokens = []
+    for w in re.findall(r"\w+", t):
+        tokens.append(w)
+        if _HANGUL.search(w) and len(w) > 2:
+            tokens.extend(w[i:i + 2] for i in range(len(w) - 1))
+    return tokens
+
+
+class BM25Index:
+    def __init__(self):
+        self.docs = []        # (종류, 본문)
+        self.lengths = []
+        self.postings = {}    # 단어 -> {문서 번호: 빈도}
+        self.total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, kind, text):
+        tf = Counter(tokenize(text))
+        with self._lock:
+            doc_id = len(self.docs)
+            self.docs.append((kind, text))
+            n = sum(tf.values())
+            self.lengths.append(n)
+            self.total_len += n
+            for term, c in tf.items():
+                self.postings.setdefault(term, {})[doc_id] = c
+        return doc_id
+
+    def search(self, query, k=TOP_K):
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self.docs)
+            if not n_docs or not terms: return []
+            avgdl = self.total_len / n_docs
+            scores = Counter()
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting: continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = tf + K1 * (1 - B + B * self.lengths[doc_id] / avgdl)
+                    scores[doc_id] += idf * tf * (K1 + 1) / norm
+            return [(self.docs[d][0], self.docs[d][1], s) for d, s in scores.most_common(k)]
+
+
+# [문서 만들기]
+def course_documents():
+    stops = [(theme, s) for theme, ss in courses.items() for s in ss]
+    ann = spatial_join.annotate_points([s['lat'] for _, s in stops], [s['lng'] for _, s in stops])
+    docs = []
+    for i, (theme, s) in enumerate(stops):
+        # 경계 없이 근사한 구는 틀릴 수 있어 문서에 넣지 않는다
+        bezirk = ann['bezirk'].iloc[i] if 'bezirk' in ann.columns and not ann['approx'].iloc[i] else None
+        where = f" 위치: {bezirk} ({BEZIRK_KO.get(bezirk, '')})" if isinstance(bezirk, str) and bezirk else ""
+        badge = ann['badge'].iloc[i] if 'badge' in ann.columns else None
+        risk = f", 범죄 위험도 {badge}" if isinstance(badge, str) else ""
+        kind = "맛집" if s.get('type') == 'food' else "명소"
+        docs.append(f"[{theme.split(':')[-1].strip()} 코스 {kind}] {s['name']}: {s['desc']}.{where}{risk}")
+    return docs
+
+
+def crime_documents(crime_file):
+    df = crime_data.load_crime_data_excel(crime_file)
+    if df.empty: return []
+    offence_cols = [c for c in df.columns if c not in ('District', '총범죄', 'Total_Crime') and 'LOR' not in str(c)]
+    try:
+        hz = spatial_join.crime_stats('bezirk')
+    except Exception:
+        hz = None
+    ranked = df.sort_values('총범죄', ascending=False).reset_index(drop=True)
+    docs = []
+    for rank, row in ranked.iterrows():
+        top = row[offence_cols].astype(float).sort_values(ascending=False).head(3)
+        text = (f"[범죄 통계] {row['District']}({BEZIRK_KO.get(row['District'], '')}) 구: 총범죄 {int(row['총범죄']):,}건 (12개 구 중 {rank + 1}위), "
+                f"많은 유형 " + ", ".join(f"{k} {int(v):,}건" for k, v in top.items()))
+        if hz is not None and row['District'] in hz.index:
+            h = hz.loc[row['District']]
+            text += f". 인구 10만명당 {h['hz']:,.0f}건 ({int(h['year'])}년), 위험도 {spatial_join.RISK_BADGES.get(h['risk'], '')}"
+        docs.append(text)
+    return docs
+
+
+# [색인] 프로세스당 하나. 후기/추천은 증분 추가
+_INDEX = {}
+_BUILD_LOCK = threading.Lock()
+
+
+def get_index(crime_file):
+    with _BUILD_LOCK:
+        state = _INDEX.get(crime_file)
+        if state is None:
+            index = BM25Index()
+            for text in course_documents(): index.add("course", text)
+            for text in crime_documents(crime_file): index.add("crime", text)
+            state = _INDEX[crime_file] = {"index": index, "review_id": 0, "rec_id": 0}
+        _add_new_posts(state)
+    return state["index"]
+
+
+def _add_new_posts(state):
+    index = state["index"]
+    for r in community.reviews_after(state["review_id"]):
+        index.add("review", f"[후기] {r['place']}: {r['body']}")
+        state["review_id"] = r['id']
+    for r in community.recommendations_after(state["rec_id"]):
+        index.add("review", f"[사용자 추천] {r['place']}: {r['reason']}")
+        state["rec_id"] = r['id']
+
+
+def context_for(question, crime_file, k=TOP_K, max_chars=MAX_CONTEXT_CHARS):
+    # 질문과 관련된 자료 몇 줄 (길이 상한 안에서 점수 순)
+    lines, used = [], 0
+    for _, text, _ in get_index(crime_file).search(question, k):
+        if used + len(text) > max_chars: break
+        lines.append(f"- {text}"); used += len(text)
+    return "\n".join(lines)
@@ -0,0 +1,228 @@
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from crime_data import CACHE_DIR
+
+# ---------------------------------------------------------
+# 프로세스 간 공유 캐시 (로컬 디스크 SQLite)
+# ---------------------------------------------------------
+# st.cache_data / 모듈 안의 캐시는 프로세스마다 따로라서 레플리카가 늘면
+# 외부 API 호출도 레플리카 수만큼 늘고, 재시작하면 전부 사라진다.
+# 같은 디스크를 보는 프로세스들이 이 파일 하나를 같이 쓴다.
+# - namespace(함수)별 TTL: 값을 쓸 때 expires_at을 같이 저장
+# - 전체 크기 상한: 넘으면 만료된 것부터, 그다음 오래 안 쓴 것부터 삭제 (LRU)
+# - lease: 같은 키의 동시 miss는 한 프로세스만 원본을 호출하고 나머지는 결과를 기다린다
+# - hit/miss 카운터 (프로세스 단위)
+# 백엔드는 set_backend()로 바꿔 끼울 수 있다 (NullBackend: 공유 캐시 끄기)
+
+DB_PATH = os.path.join(CACHE_DIR, "shared.sqlite")
+MAX_BYTES = int(os.environ.get("BERLIN_SHARED_CACHE_MAX_MB", "256")) * 1024 * 1024
+LEASE_S = 30        # 원본 호출을 맡은 프로세스가 죽어도 이 시간이 지나면 다른 프로세스가 가져간다
+POLL_S = 0.2
+TOUCH_INTERVAL_S = 60  # hit 때 accessed_at 갱신 간격
+
+
+class SqliteBackend:
+    def __init__(self, path=DB_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()     # 스키마 생성/카운터용 (DB 접근 자체는 잠그지 않는다)
+        self._local = threading.local()   # 스레드마다 연결 하나를 계속 쓴다
+        self._ready = False
+        self._counters = {}
+
+    def _init_schema(self, conn):
+        # 파일/테이블은 처음 한 번만 (WAL 모드는 파일에 기록되어 이후 연결에도 유지된다)
+        with self._lock:
+            if self._ready: return
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries (ns TEXT, key TEXT, value BLOB, size INTEGER,"
+                    " stored_at REAL, expires_at REAL, accessed_at REAL, PRIMARY KEY (ns, key))"
+                )
+                conn.execute("CREATE TABLE IF NOT EXISTS leases (ns TEXT, key TEXT, owner TEXT, until REAL, PRIMARY KEY (ns, key))")
+            self._ready = True
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._ready: self._init_schema(conn)
+        return conn
+
+    @contextmanager
+    def _db(self):
+        conn = self._conn()
+        try:
+            with conn: yield conn
+        except sqlite3.Error:
+            # 파일이 지워졌거나 연결이 깨졌으면 다음 호출에서 새로 연결하고 스키마도 다시 확인
+            self._local.conn = None
+            self._ready = False
+            conn.close()
+            raise
+
+    def _count(self, ns, name):
+        with self._lock:
+            c = self._counters.setdefault(ns, {"hits": 0, "misses": 0, "writes": 0, "errors": 0})
+            c[name] += 1
+
+    def get(self, ns, key):
+        # -> (value, stored_at) 또는 None (없음/만료)
+        now = time.time()
+        try:
+            with self._db() as conn:
+                row = conn.execute(
+                    "SELECT value, stored_at, expires_at, accessed_at FROM entries WHERE ns = ? AND key = ?", (ns, key)
+                ).fetchone()
+                # LRU 순서는 대략이면 충분하다: 최근에 기록한 항목은 다시 쓰지 않아 hit가 읽기만으로 끝난다
+                if row is not None and row[2] > now and now - row[3] > TOUCH_INTERVAL_S:
+                    conn.execute("UPDATE entries SET accessed_at = ? WHERE ns = ? AND key = ?", (now, ns, key))
+            if row is None or row[2] <= now:
+                self._count(ns, "misses")
+                return None
+            value = pickle.loads(row[0])
+        except Exception:
+            self._count(ns, "errors")
+            return None
+        self._count(ns, "hits")
+        return value, row[1]
+
+    def set(self, ns, key, value, ttl, stored_at=None):
+        now = time.time()
+        stored_at = now if stored_at is None else stored_at
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (ns, key, blob, len(blob), stored_at, stored_at + ttl, now),
+                )
+                self._evict(conn, now)
+        except Exception:
+            self._count(ns, "errors")
+            return False
+        self._count(ns, "writes")
+        return True
+
+    def _evict(self, conn, now):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes: return
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0: return
+        # 오래 안 쓴 순서로 넘친 만큼 삭제
+        rows = conn.execute("SELECT rowid, size FROM entries ORDER BY accessed_at").fetchall()
+        victims = []
+        for rowid, size in rows:
+            if excess <= 0: break
+            victims.append((rowid,)); excess -= size
+        conn.executemany("DELETE FROM entries WHERE rowid = ?", victims)
+
+    def acquire(self, ns, key, owner, lease_s=LEASE_S):
+        now = time.time()
+        try:
+            with self._db() as conn:
+                # 한 문장으로 (없음 / 만료 / 내 것)일 때만 차지 -> 프로세스 사이에서도 원자적
+                cur = conn.execute(
+                    "INSERT INTO leases VALUES (?, ?, ?, ?) ON CONFLICT (ns, key) DO UPDATE"
+                    " SET owner = excluded.owner, until = excluded.until WHERE leases.until <= ? OR leases.owner = excluded.owner",
+                    (ns, key, owner, now + lease_s, now),
+                )
+            return cur.rowcount > 0
+        except sqlite3.Error:
+            return True  # 잠금을 못 쓰면 각자 호출 (캐시가 없을 때와 같은 동작)
+
+    def release(self, ns, key, owner):
+        try:
+            with self._db() as conn:
+                conn.execute("DELETE FROM leases WHERE ns = ? AND key = ? AND owner = ?", (ns, key, owner))
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        out = {ns: dict(c) for ns, c in self._counters.items()}
+        try:
+            with self._db() as conn:
+                for ns, n, size in conn.execute("SELECT ns, COUNT(*), SUM(size) FROM entries GROUP BY ns"):
+                    out.setdefault(ns, {}).update(entries=n, bytes=size)
+        except sqlite3.Error:
+            pass
+        return out
+
+    def clear(self, ns=None):
+        with self._db() as conn:
+            if ns is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE ns = ?", (ns,))
+
+
+class NullBackend:
+    # 공유 캐시 없이 동작 (테스트나 디스크를 쓸 수 없는 환경)
+    def get(self, ns, key): return None
+    def set(self, ns, key, value, ttl, stored_at=None): return False
+    def acquire(self, ns, key, owner, lease_s=LEASE_S): return True
+    def release(self, ns, key, owner): pass
+    def stats(self): return {}
+    def clear(self, ns=None): pass
+
+
+_BACKEND = [NullBackend() if os.environ.get("BERLIN_SHARED_CACHE") == "off" else SqliteBackend()]
+
+
+def get_backend():
+    return _BACKEND[0]
+
+
+def set_backend(backend):
+    _BACKEND[0] = backend
+
+
+def _owner():
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+
+@contextmanager
+def lease(ns, key, wait=LEASE_S):
+    # 같은 (ns, key) 작업은 프로세스들 중 하나만. 다른 쪽이 잡고 있으면 풀릴 때까지(최대 wait) 기다린다
+    backend = get_backend()
+    owner = _owner()
+    deadline = time.time() + wait
+    while not backend.acquire(ns, key, owner):
+        if time.time() > deadline: break  # 맡은 쪽이 응답이 없으면 직접 진행
+        time.sleep(POLL_S)
+    try:
+        yield
+    finally:
+        backend.release(ns, key, owner)
+
+
+def fetch_once(ns, key, ttl, compute, max_age=None):
+    # 공유 캐시에 max_age(기본 ttl)보다 새 값이 있으면 그대로, 없으면 lease를 잡은 프로세스 하나만 compute()
+    # -> (value, stored_at). 다른 프로세스가 받는 중이면 그 결과가 저장될 때까지 기다린다
+    backend = get_backend()
+    max_age = ttl if max_age is None else max_age
+    fresh = lambda hit: hit is not None and time.time() - hit[1] < max_age
+    hit = backend.get(ns, key)
+    if fresh(hit): return hit
+    with lease(ns, key):
+        hit = backend.get(ns, key)  # lease를 기다리는 사이 저장됐을 수 있다
+        if fresh(hit): return hit
+        value = compute()
+        stored_at = time.time()
+        backend.set(ns, key, value, ttl)
+        return value, stored_at
+
+
+def stats():
+    return get_backend().stats()
@@ -0,0 +1,169 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import crime_panel
+import geo_data
+import geocode
+from crime_data import BERLIN_DISTRICTS
+
+# ---------------------------------------------------------
+# 좌표 -> 구 / LOR 권역 매칭 + 범죄 통계 붙이기
+# ---------------------------------------------------------
+# 경계 폴리곤을 한 번 인덱싱해 두고(경계 상자 + 변 배열),
+# 점 수천 개를 한 번에 numpy ray-casting으로 분류한다.
+# 경계 데이터가 없으면 구 단위만 가장 가까운 구 중심으로 근사한다 (approx=True).
+# 근사한 구는 틀릴 수 있으므로(예: 티어가르텐 공원 서쪽) 그 행에는 범죄 통계/배지를 붙이지 않는다.
+
+RISK_BADGES = {"low": "🟢 낮음", "mid": "🟡 보통", "high": "🔴 높음"}
+_CHUNK = 4096  # (점 × 변) 행렬이 너무 커지지 않도록 나눠서 계산
+
+
+class PolygonIndex:
+    def __init__(self, features, key_prop):
+        self.keys, self.names, self.bboxes, self.edges = [], [], [], []
+        for f in features:
+            key = f["properties"].get(key_prop)
+            if key is None: continue
+            geom = f["geometry"]
+            polys = [geom["coordinates"]] if geom["type"] == "Polygon" else geom["coordinates"]
+            rings = [np.asarray(r, dtype=float)[:, :2] for poly in polys for r in poly]
+            if not rings: continue
+            # 모든 링(외곽선/구멍/여러 조각)의 변을 한 배열로: even-odd 규칙이면 그대로 동작
+            x1 = np.concatenate([r[:-1, 0] for r in rings]); y1 = np.concatenate([r[:-1, 1] for r in rings])
+            x2 = np.concatenate([r[1:, 0] for r in rings]); y2 = np.concatenate([r[1:, 1] for r in rings])
+            allpts = np.vstack(rings)
+            self.keys.append(key)
+            self.names.append(f["properties"].get("name"))
+            self.bboxes.append((allpts[:, 1].min(), allpts[:, 0].min(), allpts[:, 1].max(), allpts[:, 0].max()))
+            self.edges.append((x1, y1, x2, y2))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def locate(self, lat, lng):
+        # -> 각 점이 속한 폴리곤 번호 (없으면 -1)
+        lat = np.asarray(lat, dtype=float); lng = np.asarray(lng, dtype=float)
+        out = np.full(len(lat), -1, dtype=int)
+        for i, ((s, w, n, e), (x1, y1, x2, y2)) in enumerate(zip(self.bboxes, self.edges)):
+            cand = np.flatnonzero((out < 0) & (lat >= s) & (lat <= n) & (lng >= w) & (lng <= e))
+            for start in range(0, len(cand), _CHUNK):
+                idx = cand[start:start + _CHUNK]
+                y = lat[idx, None]; x = lng[idx, None]
+                crosses = ((y1 > y) != (y2 > y))
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x_at = (x2 - x1) * (y - y1) / (y2 - y1) + x1
+                inside = np.count_nonzero(crosses & (x < x_at), axis=1) % 2 == 1
+                out[idx[inside]] = i
+        return out
+
+
+# [인덱스 / 통계 캐시] 성공한 결과만 프로세스에 보관 (경계 데이터가 나중에 생기면 다시 시도)
+_INDEX = {}
+_STATS = {}
+_LOCK = threading.Lock()
+
+
+def polygon_index(kind):
+    with _LOCK:
+        if kind not in _INDEX:
+            # 렌더 경로에서 호출되므로 네트워크는 쓰지 않는다 (없으면 뒤에서 받고 이번에는 근사)
+            fc = geo_data.get_boundaries(kind, "medium", allow_fetch=False)
+            if fc is None:
+                geo_data.prefetch(kind)
+                return None
+            _INDEX[kind] = PolygonIndex(fc["features"], "name" if kind == "bezirk" else "lor")
+        return _INDEX[kind]
+
+
+def crime_stats(level):
+    # level: 'bezirk' (구 이름 기준) / 'region' (LOR 키 기준)
+    # HZ가 있는 가장 최근 연도의 총범죄 건수/HZ + 같은 단위 안에서의 백분위와 위험도
+    with _LOCK:
+        if level in _STATS: return _STATS[level]
+    # 11개 연도 전체 패널 대신 최근 연도부터 한 해씩만 읽는다
+    d = None
+    for year in sorted(crime_panel.available_years(), reverse=True):
+        panel = crime_panel.load_year(year)
+        d = panel[(panel['level'] == level) & (panel['offence'] == '총범죄')]
+        if d['hz'].notna().any(): break
+    if d is None or d['hz'].isna().all(): raise ValueError("HZ가 있는 연도 없음")
+    key = 'bezirk' if level == 'bezirk' else 'lor'
+    stats = d.set_index(key)[['region', 'count', 'hz', 'year']].copy()
+    stats['pct'] = stats['hz'].rank(pct=True)
+    stats['risk'] = pd.cut(stats['pct'], [0, 1 / 3, 2 / 3, 1], labels=["low", "mid", "high"], include_lowest=True).astype(str)
+    with _LOCK:
+        _STATS[level] = stats
+    return stats
+
+
+def _nearest_district(lat, lng):
+    # 경계 데이터가 없을 때의 근사: 가장 가까운 구 중심
+    gaz = geocode.gazetteer()
+    centers = [(d, gaz[geocode.normalize_query(d)]) for d in BERLIN_DISTRICTS if geocode.normalize_query(d) in gaz]
+    names = np.array([d for d, _ in centers], dtype=object)
+    clat = np.array([c[0] for _, c in centers]); clng = np.array([c[1] for _, c in centers])
+    scale = np.cos(np.radians(52.5))
+    d2 = (lat[:, None] - clat) ** 2 + ((lng[:, None] - clng) * scale) ** 2
+    return names[np.argmin(d2, axis=1)]
+
+
+def annotate_points(lats, lngs):
+    # 좌표 배열 -> 구/권역 + 범죄 통계 표 (입력 순서 유지)
+    lat = np.asarray(lats, dtype=float); lng = np.asarray(lngs, dtype=float)
+    out = pd.DataFrame({'lat': lat, 'lng': lng})
+    if len(out) == 0: return out
+
+    b_idx = polygon_index("bezirk")
+    if b_idx is not None and len(b_idx):
+        hit = b_idx.locate(lat, lng)
+        out['bezirk'] = np.where(hit >= 0, np.array(b_idx.keys, dtype=object)[hit], None)
+        out['approx'] = False
+    else:
+        out['bezirk'] = _nearest_district(lat, lng)
+        out['approx'] = True
+
+    r_idx = polygon_index("region")
+    out['lor'] = None
+    out['region'] = None
+    if r_idx is not None and len(r_idx):
+        hit = r_idx.locate(lat, lng)
+        out['lor'] = np.where(hit >= 0, np.array(r_idx.keys, dtype=object)[hit], None)
+
+    try:
+        b_stats, r_stats = crime_stats('bezirk'), crime_stats('region')
+    except Exception:
+        return out
+    # 근사한 구에는 통계를 붙이지 않는다 (NaN -> 배지/안전 점수 생략)
+    exact = out['bezirk'].where(~out['approx'])
+    out['count'] = exact.map(b_stats['count'])
+    out['hz'] = exact.map(b_stats['hz'])
+    out['pct'] = exact.map(b_stats['pct'])
+    out['risk'] = exact.map(b_stats['risk'])
+    # 권역을 알면 더 세밀한 권역 통계로 덮어쓴다
+    has_region = out['lor'].isin(r_stats.index)
+    if has_region.any():
+        lor = out.loc[has_region, 'lor']
+        out.loc[has_region, 'region'] = lor.map(r_stats['region'])
+        for col in ('count', 'hz', 'pct', 'risk'):
+            out.loc[has_region, col] = lor.map(r_stats[col])
+    out['badge'] = out['risk'].map(RISK_BADGES)
+    return out
+
+
+def annotate_places(places):
+    # 장소 dict 목록에 위험도 배지를 붙인 새 목록
+    if not places: return places
+    ann = annotate_points([p['lat'] for p in places], [p['lng'] for p in places])
+    if 'badge' not in ann.columns: return places
+    return [dict(p, risk=r, badge=b if isinstance(b, str) else "") for p, r, b in zip(places, ann['risk'], ann['badge'])]
+
+
+def course_safety(stops):
+    # 코스 안전 점수: 0(위험) ~ 100(안전). 각 장소의 HZ 백분위 평균으로 계산
+    ann = annotate_points([s['lat'] for s in stops], [s['lng'] for s in stops])
+    if 'pct' not in ann.columns or ann['pct'].isna().all():
+        return None, ann
+    score = round(100 * (1 - ann['pct'].astype(float).mean()))
+    return score, ann
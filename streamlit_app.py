@@ -1,14 +1,27 @@
+import os
+
 import streamlit as st
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
-import requests
-import google.generativeai as genai
-import googlemaps
-import plotly.express as px
-import plotly.graph_objects as go
-import yfinance as yf
-from datetime import datetime, timedelta
+
+# 무거운 라이브러리(folium/streamlit_folium, google.generativeai, yfinance)는
+# 쓰는 탭/함수 안에서 import -> 첫 요청은 그 탭에 필요한 것만 읽는다 (한 번 읽으면 프로세스에 남음)
+# (plotly는 streamlit이 import 시점에 이미 읽으므로 미룰 수 없다. 대신 모든 페이지에 그리는 헤더에는 plotly 그림을 만들지 않음)
+# 데이터 캐시는 배포 시 python warmup.py 로 미리 만들어 둔다
+import assistant
+import community
+import crime_data
+import crime_panel
+import external_data
+import fetch_layer
+import geo_data
+import geocode
+import itinerary
+import osm_places
+import perf
+import retrieval
+import shared_cache
+import spatial_join
+from crime_data import get_crime_translation_map
 
 # ---------------------------------------------------------
 # 🚨 파일 이름 설정 (엑셀 파일명)
@@ -19,255 +32,97 @@ CRIME_FILE_NAME = "2023_berlin_crime.xlsx"
 # 1. 설정 및 API 키
 # ---------------------------------------------------------
 st.set_page_config(layout="wide", page_title="베를린 통합 가이드")
+perf.start_run(st.session_state.get('active_tab', ""))
 
-GMAPS_API_KEY = st.secrets.get("google_maps_api_key", "")
-GEMINI_API_KEY = st.secrets.get("gemini_api_key", "")
+# ?debug=1 (또는 BERLIN_DEBUG=1): 사이드바 맨 아래에 단계별 시간 / 캐시 적중률 패널
+DEBUG_PANEL = os.environ.get("BERLIN_DEBUG") == "1" or st.query_params.get("debug") == "1"
 
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-    except:
-        pass
+GEMINI_API_KEY = st.secrets.get("gemini_api_key", "")
+assistant.configure(GEMINI_API_KEY)
 
 # ---------------------------------------------------------
 # 2. 데이터 처리 함수
 # ---------------------------------------------------------
 
-# [환율]
-@st.cache_data
+# [환율] / [날씨] 원본 호출과 TTL 캐시는 external_data 모듈에서 관리
+# 헤더는 모든 페이지/rerun마다 그려지므로 plotly 그림 대신 내장 차트(st.line_chart)에 시계열만 넘긴다
 def get_exchange_rate_chart():
     try:
-        ticker = yf.Ticker("EURKRW=X")
-        hist = ticker.history(period="1mo")
+        hist = external_data.fetch_exchange_rate_history()
         current_rate = hist['Close'].iloc[-1]
-        
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=hist.index, y=hist['Close'], mode='lines', name='환율', line=dict(color='#00CC96', width=3)))
-        fig.update_layout(
-            title=None, xaxis_title=None, yaxis_title=None,
-            margin=dict(l=0, r=0, t=0, b=0), height=150, showlegend=False
-        )
-        return current_rate, fig
+        return current_rate, hist['Close'].rename('환율')
     except:
         return 1450.0, None
 
-# [날씨]
-def get_weather_desc(code):
-    if code == 0: return "☀️ 맑음"
-    if code in [1, 2, 3]: return "🌥️ 구름/흐림"
-    if code in [45, 48]: return "🌫️ 안개"
-    if code in [51, 53, 55, 61, 63, 65]: return "🌧️ 비"
-    if code in [71, 73, 75, 77]: return "❄️ 눈"
-    if code in [80, 81, 82]: return "🌦️ 소나기"
-    if code in [95, 96, 99]: return "⛈️ 천둥번개"
-    return "🌡️ 보통"
-
-@st.cache_data
 def get_weather_forecast():
     try:
-        url = "https://api.open-meteo.com/v1/forecast?latitude=52.52&longitude=13.41&current_weather=true&daily=weathercode,temperature_2m_max,temperature_2m_min&timezone=auto"
-        data = requests.get(url).json()
-        current = data['current_weather']
-        daily = data['daily']
-        desc = get_weather_desc(current['weathercode'])
-        forecast_df = pd.DataFrame({
-            '날짜': daily['time'],
-            '상태': [get_weather_desc(c) for c in daily['weathercode']],
-            '최고': daily['temperature_2m_max'],
-            '최저': daily['temperature_2m_min']
-        })
-        return current['temperature'], desc, forecast_df
+        return external_data.fetch_weather_forecast()
     except:
         return 15.0, "정보 없음", pd.DataFrame()
 
-# [범죄 데이터]
-def get_crime_translation_map():
-    return {
-        'Raub': '강도', 'Straßenraub, Handtaschen-raub': '소매치기',
-        'Körper-verletzungen -insgesamt-': '상해(전체)', 'Gefährl. und schwere Körper-verletzung': '중상해',
-        'Freiheits-beraubung, Nötigung, Bedrohung, Nachstellung': '협박/스토킹',
-        'Diebstahl -insgesamt-': '절도(전체)', 'Diebstahl von Kraftwagen': '차량절도',
-        'Diebstahl an/aus Kfz': '차량털이', 'Fahrrad-diebstahl': '자전거절도',
-        'Wohnraum-einbruch': '빈집털이', 'Branddelikte -insgesamt-': '화재범죄',
-        'Brand-stiftung': '방화', 'Sach-beschädigung -insgesamt-': '기물파손',
-        'Sach-beschädigung durch Graffiti': '그래피티', 'Rauschgift-delikte': '마약범죄',
-        'Straftaten -insgesamt-': '총범죄', 'Kieztaten': '기타 지역범죄'
-    }
-
-@st.cache_data
+# [범죄 데이터] 정제된 결과는 crime_data 모듈이 디스크 스냅샷으로 캐시 (레플리카/재시작 사이에도 공유)
+# 여기 st.cache_data는 프로세스 안의 메모리 사본일 뿐이라 개수만 제한
+@st.cache_data(max_entries=4)
 def load_crime_data_excel(file_name):
-    try:
-        df = pd.read_excel(file_name, skiprows=4, engine='openpyxl')
-        
-        # 1. 한국어로 컬럼명 강제 변경 (키워드 매칭)
-        trans_map = get_crime_translation_map()
-        new_cols = {}
-        for col in df.columns:
-            clean_col = str(col).replace('\n', '').strip()
-            mapped = False
-            for k, v in trans_map.items():
-                if k in clean_col:
-                    new_cols[col] = v
-                    mapped = True
-                    break
-            if not mapped and 'Bezeichnung' in clean_col:
-                new_cols[col] = 'District'
-                
-        df = df.rename(columns=new_cols)
-        
-        # 2. 필수 컬럼 확인
-        if 'District' not in df.columns: return pd.DataFrame()
-
-        # 3. 구 이름 필터링
-        berlin_districts = [
-            "Mitte", "Friedrichshain-Kreuzberg", "Pankow", "Charlottenburg-Wilmersdorf", 
-            "Spandau", "Steglitz-Zehlendorf", "Tempelhof-Schöneberg", "Neukölln", 
-            "Treptow-Köpenick", "Marzahn-Hellersdorf", "Lichtenberg", "Reinickendorf"
-        ]
-        df = df[df['District'].isin(berlin_districts)].copy()
-
-        # 4. 숫자 데이터 정제
-        cols_to_clean = [c for c in df.columns if c != 'District' and 'LOR' not in str(c)]
-        for c in cols_to_clean:
-            try:
-                df[c] = df[c].astype(str).str.replace('.', '', regex=False)
-                df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-            except: pass
-            
-        # 총범죄 컬럼 확보
-        if '총범죄' not in df.columns:
-            if 'Total_Crime' in df.columns:
-                df['총범죄'] = df['Total_Crime']
-            else:
-                df['총범죄'] = df[cols_to_clean].sum(axis=1)
-
-        df['Total_Crime'] = df['총범죄'] # 지도용
-        return df
-    except:
-        return pd.DataFrame()
-
-@st.cache_data
+    return crime_data.load_crime_data_excel(file_name)
+
+@st.cache_data(max_entries=4)
+def load_region_crime(file_name):
+    return crime_data.load_region_crime(file_name)
+
+# [범죄 지도] 로컬 경계 데이터 + 줌 레벨에 맞는 해상도
+# 입력(단위, 해상도, 투명도)이 같으면 결과도 같으므로 렌더링된 레이어를 재사용
+def add_crime_choropleth(m, kind, zoom, fill_opacity, show=True):
+    import folium
+    import map_layers
+    level = geo_data.level_for_zoom(zoom)
+
+    def build(target):
+        # 저장소의 geo/ 또는 캐시에 단계별 파일이 있으면 그것, 없으면 예전처럼 원본 URL에서 받는다
+        # (받은 결과는 캐시에 단계별 파일로 남고, 실패하면 RETRY_AFTER_S 동안 다시 시도하지 않음)
+        geo = geo_data.get_boundaries(kind, level)
+        if geo is None: return None
+        if kind == 'region':
+            df, columns, key_on = load_region_crime(CRIME_FILE_NAME), ["lor", "Total_Crime"], "feature.properties.lor"
+        else:
+            df, columns, key_on = load_crime_data_excel(CRIME_FILE_NAME), ["District", "Total_Crime"], "feature.properties.name"
+        if df.empty: return None
+        return folium.Choropleth(
+            geo_data=geo, data=df, columns=columns, key_on=key_on,
+            fill_color="YlOrRd", fill_opacity=fill_opacity, line_opacity=0.2, name="범죄"
+        ).add_to(target)
+
+    return map_layers.add_static_layer(m, ("crime", kind, level, fill_opacity, CRIME_FILE_NAME), build, name="범죄", show=show) is not None
+
+# [다년도 범죄 패널] signature가 바뀔 때(새 연도 파일 추가 등)만 다시 조립
+@st.cache_data(max_entries=2)
+def load_crime_panel(signature):
+    return crime_panel.load_crime_panel()
+
+# [주변 장소] 타일 캐시는 osm_places 모듈이 관리 (프로세스 메모리 + 공유 디스크 캐시, 지도 이동 시 빠진 타일만 요청)
+# 음식 종류 필터는 캐시된 장소 표에 대한 마스크일 뿐이라 네트워크 요청을 일으키지 않는다
 def get_osm_places(category, lat, lng, radius_m=3000, cuisine_filter=None):
-    # ★ 수정: 반경을 3000m로 다시 확대!
-    overpass_url = "http://overpass-api.de/api/interpreter"
-    
-    if category == 'restaurant': tag = '["amenity"="restaurant"]'
-    elif category == 'hotel': tag = '["tourism"~"hotel|hostel|guest_house"]' 
-    elif category == 'tourism': tag = '["tourism"~"attraction|museum|artwork|viewpoint"]'
-    else: return []
-
-    query = f"""[out:json];(node{tag}(around:{radius_m},{lat},{lng}););out body;"""
-    try:
-        response = requests.get(overpass_url, params={'data': query}, timeout=15) # 타임아웃 넉넉하게
-        if response.status_code != 200: return []
-        
-        data = response.json()
-        results = []
-        
-        cuisine_map = {
-            "한식": ["korean"], "양식": ["italian","french","german","american","burger","pizza","steak"],
-            "일식": ["japanese","sushi","ramen"], "중식": ["chinese","dim sum"],
-            "아시안": ["vietnamese","thai","asian","indian"], "카페": ["coffee","cafe","cake","bakery"]
-        }
-
-        for element in data['elements']:
-            if 'tags' in element:
-                name = element['tags'].get('name', '이름 없음')
-                if name == '이름 없음': continue
-                
-                raw_cuisine = element['tags'].get('cuisine', 'general').lower()
-                detected_type = "기타"
-                if category == 'restaurant':
-                    is_match = False
-                    if cuisine_filter and "전체" not in cuisine_filter:
-                        for user_select in cuisine_filter:
-                            if user_select in cuisine_map:
-                                if any(c in raw_cuisine for c in cuisine_map[user_select]):
-                                    is_match = True; detected_type = user_select; break
-                            elif user_select == "기타": 
-                                is_match = True 
-                        if not is_match: continue
-                    else:
-                        for k, v in cuisine_map.items():
-                            if any(c in raw_cuisine for c in v): detected_type = k; break
-
-                search_query = f"{name} Berlin".replace(" ", "+")
-                link = f"https://www.google.com/search?q={search_query}"
-                
-                desc = "장소"
-                if category == 'restaurant': desc = f"음식점 ({detected_type})"
-                elif category == 'hotel': desc = "숙박시설"
-                elif category == 'tourism': desc = "관광명소"
-
-                results.append({"name": name, "lat": element['lat'], "lng": element['lon'], "type": category, "desc": desc, "link": link})
-        return results
-    except: return []
+    return osm_places.get_osm_places(category, lat, lng, radius_m, cuisine_filter)
 
+# [장소 검색] 지명 사전/영구 캐시/속도 제한은 geocode 모듈에서 처리
 def search_location(query):
+    return geocode.search_location(query)
+
+# [AI 비서] 스트리밍/질문 캐시/대화 문맥은 assistant 모듈에서 처리
+def stream_gemini_response(prompt, history):
+    if not GEMINI_API_KEY and assistant.make_model is assistant.gemini_model:
+        yield "API 키 확인 필요"; return
     try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {'q': query, 'format': 'json', 'limit': 1}
-        headers = {'User-Agent': 'BerlinApp/1.0'}
-        res = requests.get(url, params=params, headers=headers).json()
-        if res: return float(res[0]['lat']), float(res[0]['lon']), res[0]['display_name']
-    except: pass
-    return None, None, None
-
-def get_gemini_response(prompt):
-    if not GEMINI_API_KEY: return "API 키 확인 필요"
-    try:
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
-        return response.text
-    except: return "AI 서비스 오류"
+        # 코스/범죄 통계/후기 중 질문과 관련된 자료를 골라 함께 보낸다 (로컬 BM25 색인)
+        context = retrieval.context_for(prompt, CRIME_FILE_NAME)
+        yield from assistant.stream_reply(prompt, history, context)
+    except Exception:
+        yield "AI 서비스 오류"
 
 # ---------------------------------------------------------
 # 3. 여행 코스 데이터
 # ---------------------------------------------------------
-courses = {
-    "🌳 Theme 1: 숲과 힐링": [
-        {"name": "1. 전승기념탑", "lat": 52.5145, "lng": 13.3501, "desc": "베를린 전경이 한눈에 보이는 황금 천사상"},
-        {"name": "2. 티어가르텐 산책", "lat": 52.5135, "lng": 13.3575, "desc": "도심 속 거대한 허파"},
-        {"name": "3. Cafe am Neuen See (점심)", "lat": 52.5076, "lng": 13.3448, "type":"food", "desc": "호수 앞 비어가든 (피자/맥주)"},
-        {"name": "4. 베를린 동물원", "lat": 52.5079, "lng": 13.3377, "desc": "세계 최대 종을 보유한 동물원"},
-        {"name": "5. 카이저 빌헬름 교회", "lat": 52.5048, "lng": 13.3350, "desc": "전쟁의 상처를 간직한 교회"}
-    ],
-    "🎨 Theme 2: 예술과 고전": [
-        {"name": "1. 베를린 돔", "lat": 52.5190, "lng": 13.4010, "desc": "웅장한 돔 지붕"},
-        {"name": "2. 구 국립 미술관", "lat": 52.5208, "lng": 13.3982, "desc": "고전 예술의 정수"},
-        {"name": "3. Monsieur Vuong (맛집)", "lat": 52.5244, "lng": 13.4085, "type":"food", "desc": "유명 베트남 쌀국수 맛집"},
-        {"name": "4. Hackescher Hof", "lat": 52.5246, "lng": 13.4020, "desc": "아르누보 양식의 안뜰"},
-        {"name": "5. 제임스 사이먼 공원", "lat": 52.5213, "lng": 13.4005, "desc": "강변 산책로"}
-    ],
-    "🏰 Theme 3: 분단의 역사": [
-        {"name": "1. 베를린 장벽 기념관", "lat": 52.5352, "lng": 13.3903, "desc": "장벽의 실제 모습"},
-        {"name": "2. Mauerpark", "lat": 52.5404, "lng": 13.4048, "desc": "주말 벼룩시장과 공원"},
-        {"name": "3. Prater Beer Garden", "lat": 52.5399, "lng": 13.4101, "type":"food", "desc": "가장 오래된 야외 맥주집"},
-        {"name": "4. 체크포인트 찰리", "lat": 52.5074, "lng": 13.3904, "desc": "분단 시절 검문소"},
-        {"name": "5. Topography of Terror", "lat": 52.5065, "lng": 13.3835, "desc": "나치 역사관"}
-    ],
-    "🕶️ Theme 4: 힙스터 성지": [
-        {"name": "1. 이스트 사이드 갤러리", "lat": 52.5050, "lng": 13.4397, "desc": "장벽 위 야외 갤러리"},
-        {"name": "2. 오버바움 다리", "lat": 52.5015, "lng": 13.4455, "desc": "붉은 벽돌 다리"},
-        {"name": "3. Burgermeister (맛집)", "lat": 52.5005, "lng": 13.4420, "type":"food", "desc": "다리 밑 힙한 버거집"},
-        {"name": "4. Voo Store", "lat": 52.5005, "lng": 13.4215, "desc": "패션 피플들의 숨겨진 편집샵"},
-        {"name": "5. Landwehr Canal", "lat": 52.4960, "lng": 13.4150, "desc": "운하 산책"}
-    ],
-    "🛍️ Theme 5: 럭셔리 & 쇼핑": [
-        {"name": "1. KaDeWe 백화점", "lat": 52.5015, "lng": 13.3414, "desc": "유럽 최대 백화점"},
-        {"name": "2. 쿠담 거리", "lat": 52.5028, "lng": 13.3323, "desc": "베를린의 샹젤리제 명품 거리"},
-        {"name": "3. Schwarzes Café", "lat": 52.5060, "lng": 13.3250, "type":"food", "desc": "24시간 영업하는 예술가들의 아지트"},
-        {"name": "4. C/O Berlin", "lat": 52.5065, "lng": 13.3325, "desc": "사진 예술 전문 미술관"},
-        {"name": "5. Savignyplatz", "lat": 52.5060, "lng": 13.3220, "desc": "고풍스러운 서점과 카페 광장"}
-    ],
-    "🌙 Theme 6: 화려한 밤": [
-        {"name": "1. TV타워", "lat": 52.5208, "lng": 13.4094, "desc": "야경 감상"},
-        {"name": "2. 로젠탈러 거리", "lat": 52.5270, "lng": 13.4020, "desc": "트렌디한 골목"},
-        {"name": "3. Clärchens Ballhaus", "lat": 52.5265, "lng": 13.3965, "type":"food", "desc": "무도회장 분위기 식사"},
-        {"name": "4. Friedrichstadt-Palast", "lat": 52.5235, "lng": 13.3885, "desc": "화려한 쇼 관람"},
-        {"name": "5. 브란덴부르크 문", "lat": 52.5163, "lng": 13.3777, "desc": "밤 조명이 켜진 랜드마크"}
-    ]
-}
+from courses import courses
 
 # ---------------------------------------------------------
 # 4. UI 구성
@@ -275,203 +130,326 @@ courses = {
 st.title("🇩🇪 베를린 통합 여행 가이드")
 st.caption("2023년 데이터 기반 안전 여행 & 맞춤 코스")
 
-if 'reviews' not in st.session_state: st.session_state['reviews'] = {}
-if 'recommendations' not in st.session_state: st.session_state['recommendations'] = []
 if 'messages' not in st.session_state: st.session_state['messages'] = []
 if 'map_center' not in st.session_state: st.session_state['map_center'] = [52.5200, 13.4050]
 if 'search_marker' not in st.session_state: st.session_state['search_marker'] = None
+if 'map_zoom' not in st.session_state: st.session_state['map_zoom'] = 14
+if 'map_bounds' not in st.session_state: st.session_state['map_bounds'] = None
+if 'map_view' not in st.session_state: st.session_state['map_view'] = None  # 브라우저가 마지막으로 알려 준 지도 중심
+if 'map_origin' not in st.session_state: st.session_state['map_origin'] = None  # (지도 구성, 처음 위치, 처음 줌)
 
-# [상단: 환율 & 날씨]
+# [상단: 환율 & 날씨] 자리만 먼저 잡고, 값은 사이드바 설정을 읽은 뒤 지도 데이터와 함께 동시에 받는다
 c1, c2 = st.columns(2)
-with c1:
-    rate, fig_rate = get_exchange_rate_chart()
-    st.metric("💶 유로 환율 (1 EUR)", f"{rate:.0f}원", delta="실시간")
-    if fig_rate:
-        with st.expander("📉 1개월 환율 추이 (클릭)", expanded=False):
-            st.plotly_chart(fig_rate, use_container_width=True)
-
-with c2:
-    temp, desc, df_fore = get_weather_forecast()
-    st.metric("⛅ 베를린 날씨", f"{temp}°C", delta=desc)
-    if not df_fore.empty:
-        with st.expander("📅 7일 날씨 예보 (클릭)", expanded=False):
-            st.dataframe(df_fore, hide_index=True)
-
 st.divider()
 
 # 사이드바
 st.sidebar.title("🛠️ 여행 도구")
 search_query = st.sidebar.text_input("📍 장소 검색 (이동)", placeholder="예: Kreuzberg")
 if search_query:
-    lat, lng, name = search_location(search_query + " Berlin")
+    with perf.span("search"):
+        lat, lng, name = search_location(search_query + " Berlin")
     if lat:
+        if st.session_state['map_center'] != [lat, lng]:
+            # 이전 화면 범위로 새 위치의 장소를 잘라내지 않도록, 지도도 새 위치의 기본 화면으로
+            st.session_state['map_bounds'] = None
+            st.session_state['map_view'] = None
+            st.session_state['map_zoom'] = 14
         st.session_state['map_center'] = [lat, lng]
         st.session_state['search_marker'] = {"lat": lat, "lng": lng, "name": name}
         st.sidebar.success(f"이동: {name}")
 
 st.sidebar.divider()
 st.sidebar.subheader("👀 지도 필터")
-show_crime = st.sidebar.checkbox("🚨 범죄 위험도 (지역별)", value=True)
+client_layers = st.sidebar.toggle("🗂️ 지도 안에서 레이어 켜고 끄기", value=False,
+                                  help="모든 레이어를 한 번에 보내고 지도 오른쪽 위 버튼으로 전환합니다 (전환할 때 다시 불러오지 않음). 아래 체크는 처음 보이는 레이어만 정합니다")
+show_crime = st.sidebar.checkbox("🚨 범죄 위험도 (지역별)", value=True, disabled=client_layers)
+crime_unit = st.sidebar.radio("범죄 지도 단위", ["구", "권역(LOR)"], horizontal=True, disabled=not (show_crime or client_layers))
+crime_kind = 'region' if crime_unit == "권역(LOR)" else 'bezirk'
 st.sidebar.write("---")
-show_food = st.sidebar.checkbox("🍽️ 주변 맛집", value=True)
-show_hotel = st.sidebar.checkbox("🏨 숙박시설", value=False)
-show_tour = st.sidebar.checkbox("📸 관광명소", value=False)
+show_food = st.sidebar.checkbox("🍽️ 주변 맛집", value=True, disabled=client_layers)
+show_hotel = st.sidebar.checkbox("🏨 숙박시설", value=False, disabled=client_layers)
+show_tour = st.sidebar.checkbox("📸 관광명소", value=False, disabled=client_layers)
+fast_markers = st.sidebar.toggle("⚡ 빠른 마커 (클러스터)", value=True, help="장소가 많을 때 지도 로딩을 빠르게 합니다")
 
 st.sidebar.write("---")
 st.sidebar.markdown("**🥘 음식점 유형 (자유탐험 탭)**")
 cuisine_options = ["전체", "한식", "양식", "일식", "중식", "아시안", "카페", "기타"]
 selected_cuisines = st.sidebar.multiselect("원하는 종류 선택", cuisine_options, default=["전체"])
 
-# 탭 구성
-tab1, tab2, tab3, tab4 = st.tabs(["🗺️ 통합 지도", "🚩 추천 코스", "💬 커뮤니티/AI", "📊 범죄 분석"])
+# 탭 구성: 선택된 탭만 실행한다 (on_change="rerun" -> 보이지 않는 탭은 .open이 False)
+tab1, tab2, tab3, tab4 = st.tabs(["🗺️ 통합 지도", "🚩 추천 코스", "💬 커뮤니티/AI", "📊 범죄 분석"], key="active_tab", on_change="rerun")
+
+# 외부 호출(환율, 날씨, 지도 장소)은 서로 독립적이므로 한꺼번에 병렬 실행
+# -> 콜드 캐시에서도 페이지 준비 시간 = 가장 느린 호출 하나. 지도 장소는 지도 탭이 열려 있을 때만
+center = st.session_state['map_center']
+osm_categories = [c for c, on in (('restaurant', show_food), ('hotel', show_hotel), ('tourism', show_tour)) if on or client_layers]
+calls = {'rate': (get_exchange_rate_chart,), 'weather': (get_weather_forecast,)}
+if tab1.open:
+    calls['places'] = (osm_places.ensure_tiles, osm_categories, center[0], center[1], 3000)
+with perf.span("fetch (parallel)"):
+    fetched = fetch_layer.run_concurrently(calls)
+if tab3.open:
+    # AI 비서용 검색 색인은 기다리지 않고 뒤에서 만들어 둔다 (첫 질문 전에 준비, 이후엔 새 글만 추가)
+    fetch_layer.submit(retrieval.get_index, CRIME_FILE_NAME)
+
+with c1:
+    rate, rate_hist = fetched['rate']
+    st.metric("💶 유로 환율 (1 EUR)", f"{rate:.0f}원", delta="실시간")
+    if rate_hist is not None and not rate_hist.empty:
+        with st.expander("📉 1개월 환율 추이 (클릭)", expanded=False):
+            st.line_chart(rate_hist, height=150, color='#00CC96')
+
+with c2:
+    temp, desc, df_fore = fetched['weather']
+    st.metric("⛅ 베를린 날씨", f"{temp}°C", delta=desc)
+    if not df_fore.empty:
+        with st.expander("📅 7일 날씨 예보 (클릭)", expanded=False):
+            st.dataframe(df_fore, hide_index=True)
+
 
 # =========================================================
 # TAB 1: 통합 지도
 # =========================================================
-with tab1:
-    center = st.session_state['map_center']
-    m = folium.Map(location=center, zoom_start=14)
-
-    if show_crime:
-        crime_df = load_crime_data_excel(CRIME_FILE_NAME)
-        if not crime_df.empty:
-            folium.Choropleth(
-                geo_data="https://raw.githubusercontent.com/funkeinteraktiv/Berlin-Geodaten/master/berlin_bezirke.geojson",
-                data=crime_df, columns=["District", "Total_Crime"], key_on="feature.properties.name",
-                fill_color="YlOrRd", fill_opacity=0.5, line_opacity=0.2, name="범죄"
-            ).add_to(m)
+@st.fragment
+@perf.timed("tab:map")
+def map_tab():
+    import folium
+    import map_layers
+    from streamlit_folium import st_folium
+    # 레이어 전환 모드: 모든 레이어를 이름 붙은 그룹으로 한 번에 보내고 지도 안의 LayerControl로 켜고 끈다.
+    # 지도는 (중심, 데이터)가 바뀔 때만 달라지고, 지도 조작 결과도 돌려받지 않으므로 재실행이 없다
+    # 일반 모드: st_folium은 지도 스크립트가 바뀌면 지도를 새로 띄운다(스크립트의 처음 위치/줌으로).
+    # 화면 범위에 따라 바뀌는 장소 마커는 스크립트가 아니라 feature_group_to_add로 보내 다시 띄우지 않고 교체한다.
+    # 스크립트 내용(검색 위치, 범죄 레이어 종류/해상도 등)이 바뀔 때만 처음 위치/줌을 현재 화면으로 옮긴다
+    # -> 줌을 바꿔 범죄 지도 해상도가 달라져도 그 화면 그대로 다시 뜨고, 그냥 움직일 때는 스크립트가 그대로
+    level = geo_data.level_for_zoom(st.session_state['map_zoom'])
+    signature = (tuple(center), crime_kind, level, show_crime, client_layers, geo_data.has_local(crime_kind, level),
+                 str(st.session_state['search_marker']))
+    origin = st.session_state['map_origin']
+    if origin is None or origin[0] != signature:
+        origin = st.session_state['map_origin'] = (signature, st.session_state['map_view'] or center, st.session_state['map_zoom'])
+    m = folium.Map(location=origin[1], zoom_start=origin[2])
+
+    if show_crime or client_layers:
+        with perf.span("map:crime layer"):
+            crime_ok = add_crime_choropleth(m, crime_kind, st.session_state['map_zoom'], 0.5, show=show_crime)
+        if not crime_ok:
+            st.caption("⚠️ 경계 데이터를 불러오지 못해 범죄 지도를 생략했습니다.")
 
     if st.session_state['search_marker']:
         sm = st.session_state['search_marker']
-        folium.Marker([sm['lat'], sm['lng']], popup=sm['name'], icon=folium.Icon(color='red', icon='info-sign')).add_to(m)
-
-    # 3. 장소 마커 (반경 3000m)
-    if show_food:
-        places = get_osm_places('restaurant', center[0], center[1], 3000, selected_cuisines)
-        fg_food = folium.FeatureGroup(name="맛집")
-        for p in places:
-            html = f"""<div style='width:150px'><b>{p['name']}</b><br><span style='color:grey'>{p['desc']}</span><br><a href='{p['link']}' target='_blank'>구글 검색</a></div>"""
-            folium.Marker([p['lat'], p['lng']], popup=html, icon=folium.Icon(color='green', icon='cutlery', prefix='fa')).add_to(fg_food)
-        fg_food.add_to(m)
-
-    if show_hotel:
-        places = get_osm_places('hotel', center[0], center[1], 3000)
-        fg_hotel = folium.FeatureGroup(name="호텔")
-        for p in places:
-            html = f"""<div style='width:150px'><b>{p['name']}</b><br><span style='color:grey'>{p['desc']}</span><br><a href='{p['link']}' target='_blank'>구글 검색</a></div>"""
-            folium.Marker([p['lat'], p['lng']], popup=html, icon=folium.Icon(color='blue', icon='bed', prefix='fa')).add_to(fg_hotel)
-        fg_hotel.add_to(m)
-
-    if show_tour:
-        places = get_osm_places('tourism', center[0], center[1], 3000)
-        fg_tour = folium.FeatureGroup(name="관광")
-        for p in places:
-            html = f"""<div style='width:150px'><b>{p['name']}</b><br><span style='color:grey'>{p['desc']}</span><br><a href='{p['link']}' target='_blank'>구글 검색</a></div>"""
-            folium.Marker([p['lat'], p['lng']], popup=html, icon=folium.Icon(color='purple', icon='camera', prefix='fa')).add_to(fg_tour)
-        fg_tour.add_to(m)
-
-    st_folium(m, width="100%", height=600)
+        sm_badge = spatial_join.annotate_places([sm])[0].get('badge')
+        sm_popup = f"{sm['name']}<br><small>범죄 위험도: {sm_badge}</small>" if sm_badge else sm['name']
+        folium.Marker([sm['lat'], sm['lng']], popup=sm_popup, icon=folium.Icon(color='red', icon='info-sign')).add_to(m)
+
+    # 3. 장소 마커 (반경 3000m) - 화면 밖 장소는 제외하고 레이어당 개수 제한
+    # (레이어 전환 모드에서는 화면 범위를 돌려받지 않으므로 개수 제한만)
+    bounds = None if client_layers else st.session_state['map_bounds']
+    place_groups = []
+    place_layers = [
+        (show_food, 'restaurant', "맛집", 'green', 'cutlery', selected_cuisines),
+        (show_hotel, 'hotel', "호텔", 'blue', 'bed', None),
+        (show_tour, 'tourism', "관광", 'purple', 'camera', None),
+    ]
+    for on, category, layer_name, color, icon, cuisine_filter in place_layers:
+        if not (on or client_layers): continue
+        with perf.span("map:places"):
+            places = get_osm_places(category, center[0], center[1], 3000, cuisine_filter)
+            places = map_layers.cull_places(places, center, bounds)
+            places = spatial_join.annotate_places(places)  # 팝업에 범죄 위험도 배지
+            if client_layers:
+                map_layers.add_place_layer(m, places, layer_name, color, icon, fast=fast_markers, show=on)
+            else:
+                group = folium.FeatureGroup(name=layer_name)
+                map_layers.add_place_layer(group, places, layer_name, color, icon, fast=fast_markers)
+                place_groups.append(group)
+
+    if client_layers:
+        folium.LayerControl(collapsed=False).add_to(m)
+    with perf.span("map:st_folium"):
+        map_state = st_folium(m, width="100%", height=600, returned_objects=[] if client_layers else None,
+                              feature_group_to_add=place_groups or None)
+    # 지도를 새로 띄운 직후에는 브라우저 값 대신 기본값(처음 위치/줌, 데이터 범위)이 돌아온다 -> center가 있는 값만 반영
+    if map_state and map_state.get('center'):
+        st.session_state['map_view'] = [map_state['center']['lat'], map_state['center']['lng']]
+        st.session_state['map_zoom'] = map_state.get('zoom') or st.session_state['map_zoom']
+        st.session_state['map_bounds'] = map_layers.bounds_from_state(map_state)
 
 # =========================================================
 # TAB 2: 추천 코스
 # =========================================================
-with tab2:
+@st.fragment
+@perf.timed("tab:course")
+def course_tab():
+    import folium
+    import map_layers
+    from streamlit_folium import st_folium
     st.subheader("🚩 테마별 추천 여행 코스")
     themes = list(courses.keys())
     selected_theme = st.radio("테마 선택:", themes, horizontal=True)
     course_data = courses[selected_theme]
     show_crime_course = st.checkbox("🚨 이 지도에도 범죄 위험도 표시", value=False)
+    optimize_course = st.checkbox("🔀 최단 동선으로 순서 바꾸기 (첫 장소 출발)", value=False)
+    course_points = [(s['lat'], s['lng']) for s in course_data]
+    if optimize_course:
+        course_order, walk_m = itinerary.optimize_order(course_points)
+        course_data = [course_data[i] for i in course_order]
+    else:
+        walk_m = itinerary.route_length(itinerary.walking_matrix(course_points), range(len(course_points)))
+    safety_score, course_risk = spatial_join.course_safety(course_data)
+    k_col1, k_col2 = st.columns(2)
+    k_col1.metric("🚶 총 도보 거리", f"{walk_m / 1000:.1f} km", delta=f"약 {itinerary.walking_minutes(walk_m):.0f}분", delta_color="off")
+    if safety_score is not None:
+        k_col2.metric("🛡️ 코스 안전 점수", f"{safety_score}/100", help="코스 장소가 속한 지역의 인구 10만명당 범죄 발생(HZ) 백분위로 계산 (높을수록 안전)")
+    elif course_risk.get('approx', pd.Series(dtype=bool)).any():
+        k_col2.caption("⚠️ 경계 데이터가 없어 코스 안전 점수와 위험도 배지를 생략했습니다.")
 
     c_col1, c_col2 = st.columns([2, 1])
     FIXED_HEIGHT = 800
 
     with c_col1:
-        m2 = folium.Map(location=[course_data[2]['lat'], course_data[2]['lng']], zoom_start=13)
-        if show_crime_course:
-            crime_df = load_crime_data_excel(CRIME_FILE_NAME)
-            if not crime_df.empty:
-                folium.Choropleth(
-                    geo_data="https://raw.githubusercontent.com/funkeinteraktiv/Berlin-Geodaten/master/berlin_bezirke.geojson",
-                    data=crime_df, columns=["District", "Total_Crime"], key_on="feature.properties.name",
-                    fill_color="YlOrRd", fill_opacity=0.4, line_opacity=0.2, name="범죄"
-                ).add_to(m2)
-
-        points = []
+        # 코스 지도는 (코스 순서, 범죄 레이어 여부)로 완전히 결정되므로 완성된 HTML을 캐시
+        course_stops = []
         for i, item in enumerate(course_data):
-            loc = [item['lat'], item['lng']]
-            points.append(loc)
-            
-            if item.get('type') == 'food':
-                icon_name = 'cutlery'; icon_color = 'orange'
-            else:
-                icon_name = 'camera'; icon_color = 'blue'
-            
-            folium.Marker(loc, tooltip=f"{i+1}. {item['name']}", icon=folium.Icon(color=icon_color, icon=icon_name, prefix='fa')).add_to(m2)
-        
-        folium.PolyLine(points, color="red", weight=4, opacity=0.7).add_to(m2)
-        st_folium(m2, height=FIXED_HEIGHT, use_container_width=True)
+            badge = course_risk['badge'].iloc[i] if 'badge' in course_risk.columns else None
+            tooltip = f"{i+1}. {item['name']}" + (f" · {badge}" if isinstance(badge, str) else "")
+            course_stops.append((item['lat'], item['lng'], tooltip, item.get('type') == 'food'))
+
+        def build_course_map(with_crime):
+            # 범죄 레이어를 못 붙이면 None -> 그 결과는 캐시하지 않는다 (경계를 나중에 받으면 다시 시도)
+            m2 = folium.Map(location=[course_data[2]['lat'], course_data[2]['lng']], zoom_start=13)
+            if with_crime and not add_crime_choropleth(m2, 'bezirk', 13, 0.4):
+                return None
+            for lat, lng, tooltip, is_food in course_stops:
+                if is_food:
+                    icon_name = 'cutlery'; icon_color = 'orange'
+                else:
+                    icon_name = 'camera'; icon_color = 'blue'
+                folium.Marker([lat, lng], tooltip=tooltip, icon=folium.Icon(color=icon_color, icon=icon_name, prefix='fa')).add_to(m2)
+            folium.PolyLine([[lat, lng] for lat, lng, _, _ in course_stops], color="red", weight=4, opacity=0.7).add_to(m2)
+            return m2
+
+        with perf.span("course:map html"):
+            course_html = map_layers.cached_map_html(("course", tuple(course_stops), show_crime_course), lambda: build_course_map(show_crime_course))
+            if course_html is None:
+                st.caption("⚠️ 경계 데이터를 불러오지 못해 범죄 지도를 생략했습니다.")
+                course_html = map_layers.cached_map_html(("course", tuple(course_stops), False), lambda: build_course_map(False))
+        st.iframe(course_html, height=FIXED_HEIGHT)
         
     with c_col2:
         with st.container(height=FIXED_HEIGHT):
             st.markdown(f"### 🚶 {selected_theme}")
             st.markdown('<style>div.row-widget.stRadio > div{flex-direction:row;}</style>', unsafe_allow_html=True)
             for idx, spot in enumerate(course_data):
-                st.info(f"**{idx+1}. {spot['name']}**\n\n{spot['desc']}")
+                badge = course_risk['badge'].iloc[idx] if 'badge' in course_risk.columns else None
+                risk_line = f"\n\n범죄 위험도: {badge}" if isinstance(badge, str) else ""
+                st.info(f"**{idx+1}. {spot['name']}**\n\n{spot['desc']}{risk_line}")
                 q = spot['name'].replace(" ", "+") + "+Berlin"
                 st.markdown(f"[👉 구글 검색 바로가기](https://www.google.com/search?q={q})")
                 st.write("")
 
+    # 나만의 코스: 추천 코스 장소 + 지도 주변 장소에서 골라 최단 동선 계산
+    with st.expander("🧭 나만의 코스 만들기", expanded=False):
+        candidates = {f"{p['name']} ({theme.split(':')[0]})": p for theme, stops in courses.items() for p in stops}
+        # 주변 장소는 원할 때만 (OSM 요청이 필요할 수 있으므로). 두 카테고리의 빠진 타일은 한 번의 요청으로
+        if st.toggle("지도 주변 관광지/맛집도 후보에 넣기", key="custom_route_nearby"):
+            osm_places.ensure_tiles(['tourism', 'restaurant'], center[0], center[1], 3000)
+            for category, label in (('tourism', "관광"), ('restaurant', "맛집")):
+                nearby = map_layers.cull_places(get_osm_places(category, center[0], center[1], 3000), center, max_points=100)
+                candidates.update({f"{p['name']} ({label})": p for p in nearby})
+        picked = st.multiselect("방문할 장소 (첫 번째가 출발지)", list(candidates.keys()), max_selections=40)
+        if len(picked) >= 2:
+            stops = [candidates[k] for k in picked]
+            stop_points = [(p['lat'], p['lng']) for p in stops]
+            order, total_m = itinerary.optimize_order(stop_points)
+            st.success(f"총 {total_m / 1000:.1f} km · 도보 약 {itinerary.walking_minutes(total_m):.0f}분 ({len(stops)}곳)")
+            legs = itinerary.leg_summary(stop_points, order)
+            st.dataframe(pd.DataFrame({
+                '순서': range(1, len(legs) + 1),
+                '출발': [picked[l['from']] for l in legs],
+                '도착': [picked[l['to']] for l in legs],
+                '거리(m)': [round(l['m']) for l in legs],
+                '시간(분)': [round(l['min']) for l in legs],
+            }), hide_index=True)
+            m3 = folium.Map(location=stop_points[order[0]], zoom_start=13)
+            for n, i in enumerate(order):
+                folium.Marker(stop_points[i], tooltip=f"{n+1}. {stops[i]['name']}").add_to(m3)
+            folium.PolyLine([stop_points[i] for i in order], color="blue", weight=4, opacity=0.7).add_to(m3)
+            st_folium(m3, height=450, use_container_width=True, key="custom_route_map")
+
 # =========================================================
 # TAB 3: 커뮤니티 & AI
 # =========================================================
-with tab3:
+@st.fragment
+@perf.timed("tab:community")
+def community_tab():
     col_review, col_rec = st.columns(2)
     with col_review:
         st.subheader("💬 장소별 후기")
         all_places = sorted(list(set([p['name'] for v in courses.values() for p in v])))
         target_place = st.selectbox("장소 선택", ["선택하세요"] + all_places)
         if target_place != "선택하세요":
-            if target_place not in st.session_state['reviews']: st.session_state['reviews'][target_place] = []
-            with st.form(f"review_{target_place}"):
+            with st.form(f"review_{target_place}", clear_on_submit=True):
                 rv_text = st.text_area("내용")
                 if st.form_submit_button("등록"):
-                    st.session_state['reviews'][target_place].append(rv_text); st.rerun()
-            if st.session_state['reviews'][target_place]:
-                for rv in st.session_state['reviews'][target_place]: st.success(f"🗣️ {rv}")
+                    community.add_review(target_place, rv_text)
+            # 최근 후기부터 한 페이지씩 ("더 보기"로 늘림). 쓰기가 목록보다 먼저라 새 글도 바로 보인다
+            limit_key = f"review_limit_{target_place}"
+            limit = st.session_state.get(limit_key, community.PAGE_SIZE)
+            for rv in community.list_reviews(target_place, limit): st.success(f"🗣️ {rv['body']}")
+            total = community.count_reviews(target_place)
+            if total > limit:
+                st.button(f"더 보기 ({limit}/{total})", key=f"more_{target_place}",
+                          on_click=lambda: st.session_state.update({limit_key: limit + community.PAGE_SIZE}))
 
     with col_rec:
         st.subheader("👍 나만의 추천")
         with st.form("rec_form", clear_on_submit=True):
             name = st.text_input("장소명"); reason = st.text_input("이유")
             if st.form_submit_button("추천"):
-                st.session_state['recommendations'].insert(0, {"place": name, "desc": reason, "replies": []}); st.rerun()
-        if st.session_state['recommendations']:
-            for i, rec in enumerate(st.session_state['recommendations']):
-                with st.expander(f"📍 {rec['place']}", expanded=True):
-                    st.write(rec['desc'])
-                    for reply in rec['replies']: st.caption(f"↳ {reply}")
-                    r_text = st.text_input("댓글", key=f"re_{i}")
-                    if st.button("등록", key=f"btn_{i}"):
-                        rec['replies'].append(r_text); st.rerun()
+                if community.add_recommendation(name, reason): st.session_state['rec_page'] = 0
+        # 한 페이지(PAGE_SIZE개)만 읽고 그린다 -> 글이 많아져도 재실행 비용 일정
+        total = community.count_recommendations()
+        pages = max(1, -(-total // community.PAGE_SIZE))
+        page = min(st.session_state.get('rec_page', 0), pages - 1)
+        for rec in community.list_recommendations(community.PAGE_SIZE, page * community.PAGE_SIZE):
+            with st.expander(f"📍 {rec['place']}", expanded=True):
+                st.write(rec['reason'])
+                replies_box = st.container()  # 댓글 목록은 폼 위에 보이지만, 방금 쓴 댓글까지 넣어서 나중에 채운다
+                with st.form(f"reply_{rec['id']}", clear_on_submit=True, border=False):
+                    r_text = st.text_input("댓글")
+                    if st.form_submit_button("등록") and community.add_reply(rec['id'], r_text):
+                        rec['replies'].append(r_text.strip())
+                for reply in rec['replies']: replies_box.caption(f"↳ {reply}")
+        if pages > 1:
+            p_prev, p_info, p_next = st.columns([1, 2, 1])
+            p_prev.button("◀ 이전", disabled=page == 0, key="rec_prev", on_click=lambda: st.session_state.update(rec_page=page - 1))
+            p_info.caption(f"{page + 1} / {pages} 페이지 (총 {total}개)")
+            p_next.button("다음 ▶", disabled=page >= pages - 1, key="rec_next", on_click=lambda: st.session_state.update(rec_page=page + 1))
 
     st.divider()
     st.subheader("🤖 Gemini 여행 비서")
     chat_box = st.container(height=300)
-    for msg in st.session_state['messages']: chat_box.chat_message(msg['role']).write(msg['content'])
+    history = st.session_state['messages']  # assistant.MAX_MESSAGES개까지만 보관
+    for msg in history: chat_box.chat_message(msg['role']).write(msg['content'])
     if prompt := st.chat_input("질문하세요..."):
-        st.session_state['messages'].append({"role": "user", "content": prompt})
         chat_box.chat_message("user").write(prompt)
         with chat_box.chat_message("assistant"):
-            resp = get_gemini_response(prompt); st.write(resp)
-        st.session_state['messages'].append({"role": "assistant", "content": resp})
+            resp = st.write_stream(stream_gemini_response(prompt, history))
+        history += [{"role": "user", "content": prompt}, {"role": "assistant", "content": resp}]
+        st.session_state['messages'] = assistant.trim_history(history)
 
 # =========================================================
 # TAB 4: 범죄 통계 (한글화)
 # =========================================================
-with tab4:
+@st.fragment
+@perf.timed("tab:crime")
+def crime_tab():
+    import plotly.express as px
     st.header("📊 베를린 범죄 데이터 분석 (한국어)")
     
-    df_stat = load_crime_data_excel(CRIME_FILE_NAME)
+    with perf.span("crime:load"):
+        df_stat = load_crime_data_excel(CRIME_FILE_NAME)
     trans_map = get_crime_translation_map()
     
     if not df_stat.empty:
@@ -509,5 +487,88 @@ with tab4:
             all_sums = df_stat[crime_cols].sum().sort_values(ascending=False).head(10)
             fig_pie = px.pie(values=all_sums.values, names=all_sums.index, hole=0.3)
             st.plotly_chart(fig_pie, use_container_width=True)
+
+        # 연도별 추이 (2014~ 다년도 패널)
+        with perf.span("crime:panel"):
+            panel = load_crime_panel(crime_panel.panel_signature())
+        if not panel.empty:
+            st.divider()
+            st.subheader("📈 연도별 범죄 추이")
+            years = sorted(panel['year'].unique())
+            st.caption(f"{years[0]}~{years[-1]}년 경찰 범죄 통계(PKS) 기준")
+            offences = sorted(panel['offence'].unique())
+            t_col1, t_col2 = st.columns(2)
+            sel_offence = t_col1.selectbox("범죄 유형", offences, index=offences.index('총범죄') if '총범죄' in offences else 0)
+            sel_measure = t_col2.radio("기준", ["건수", "인구 10만명당(HZ)"], horizontal=True)
+            measure = 'count' if sel_measure == "건수" else 'hz'
+
+            trend = crime_panel.district_trend(panel, sel_offence, measure)
+            fig_trend = px.line(trend, markers=True, labels={'value': sel_measure, 'year': '연도', 'bezirk': '지역'})
+            st.plotly_chart(fig_trend, use_container_width=True)
+
+            c3, c4 = st.columns(2)
+            with c3:
+                st.subheader(f"📉 {selected_district} 전년 대비 증감")
+                yoy = crime_panel.year_over_year(panel, selected_district, sel_offence).dropna(subset=['yoy_pct'])
+                fig_yoy = px.bar(yoy, x='year', y='yoy_pct', labels={'year': '연도', 'yoy_pct': '증감률(%)'},
+                                 color='yoy_pct', color_continuous_scale='RdYlGn_r', color_continuous_midpoint=0)
+                st.plotly_chart(fig_yoy, use_container_width=True)
+            with c4:
+                hz_years = panel.loc[panel['hz'].notna(), 'year']
+                if not hz_years.empty:
+                    hz_year = int(hz_years.max())
+                    st.subheader(f"⚖️ 인구 대비 비교 ({hz_year})")
+                    df_hz = panel[(panel['year'] == hz_year) & (panel['level'] == 'bezirk') & (panel['offence'] == sel_offence)]
+                    fig_hz = px.bar(df_hz.sort_values('hz'), x='hz', y='bezirk', orientation='h', color='hz',
+                                    color_continuous_scale='Reds', labels={'hz': '10만명당 건수', 'bezirk': ''})
+                    st.plotly_chart(fig_hz, use_container_width=True)
     else:
         st.warning("데이터 파일 확인 필요")
+
+# =========================================================
+# 선택된 탭 렌더링
+# =========================================================
+# 각 탭은 fragment: 탭 안의 위젯(댓글 입력, 채팅, 지도 이동 등)을 건드리면
+# 스크립트 전체가 아니라 그 탭 함수만 다시 실행된다.
+# 사이드바 설정/탭 전환은 전체 재실행 -> 열린 탭 하나만 계산
+for tab, render in ((tab1, map_tab), (tab2, course_tab), (tab3, community_tab), (tab4, crime_tab)):
+    if tab.open:
+        with tab: render()
+
+# =========================================================
+# 디버그: 이번 rerun 단계별 시간 + 캐시 적중률
+# =========================================================
+def debug_panel(run):
+    import map_layers
+    with st.sidebar.expander("⏱️ 성능 (디버그)", expanded=True):
+        if run:
+            st.caption(f"이번 실행 {run['total'] * 1000:.0f} ms (탭 안 조작은 탭만 다시 실행되어 아래 누적에만 반영)")
+            st.dataframe(pd.DataFrame([(n, round(s * 1000, 1)) for n, s in run['spans']], columns=["단계", "ms"]), hide_index=True)
+        recent = perf.recent_runs()
+        if recent:
+            st.caption("최근 실행 (ms): " + ", ".join(f"{r['total'] * 1000:.0f}" for r in recent[-10:]))
+        totals = perf.totals()
+        if totals:
+            st.markdown("**단계별 누적**")
+            st.dataframe(pd.DataFrame([
+                {"단계": n, "횟수": t['count'], "평균 ms": round(t['mean_ms'], 1), "최대 ms": round(t['max_ms'], 1)}
+                for n, t in sorted(totals.items())
+            ]), hide_index=True)
+        st.markdown("**캐시 적중률**")
+        rows = [{"캐시": f"fetch:{n}", **c} for n, c in fetch_layer.cache_stats().items()]
+        rows += [{"캐시": f"shared:{n}", **c} for n, c in shared_cache.stats().items()]
+        rows.append({"캐시": "map render", **map_layers.render_cache_stats()})
+        for row in rows:
+            rate = perf.hit_rate(row)
+            row["적중률"] = f"{rate:.0%}" if rate is not None else "-"
+        df_cache = pd.DataFrame(rows).set_index("캐시")
+        counts = df_cache.columns.drop("적중률")
+        df_cache[counts] = df_cache[counts].fillna(0).astype(int)
+        st.dataframe(df_cache)
+        tiles = osm_places.cache_stats()
+        st.caption("OSM 타일: " + ", ".join(f"{c} {t['tiles']}개/{t['elements']}곳" for c, t in tiles.items()))
+
+
+finished_run = perf.end_run()
+if DEBUG_PANEL:
+    debug_panel(finished_run)
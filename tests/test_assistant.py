@@ -0,0 +1,71 @@
+import pytest
+
+import assistant
+import shared_cache
+
+# StubModel로 질문 캐시/대화 문맥 확인 (API 키/네트워크 없이: python -m pytest)
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    stub = assistant.StubModel()
+    monkeypatch.setattr(assistant, "make_model", lambda: stub)
+    backend = shared_cache.get_backend()
+    shared_cache.set_backend(shared_cache.SqliteBackend(path=str(tmp_path / "shared.sqlite")))
+    yield stub
+    shared_cache.set_backend(backend)
+
+
+def _ask(prompt, history=(), context=""):
+    return "".join(assistant.stream_reply(prompt, history, context))
+
+
+def _history(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"} for i in range(n)]
+
+
+def test_cache_hit_skips_model(model):
+    first = _ask("Brandenburger Tor 입장료?")
+    assert model.calls == 1
+    # 대소문자/공백/끝 문장부호만 다른 질문은 같은 캐시 항목
+    assert _ask("  brandenburger tor   입장료 ") == first
+    assert model.calls == 1
+    # 참고 자료가 다르면 다시 묻는다
+    _ask("Brandenburger Tor 입장료?", context="자료")
+    assert model.calls == 2
+
+
+def test_cache_skipped_once_history_exists(model):
+    _ask("맛집 추천")
+    history = [{"role": "user", "content": "맛집 추천"}, {"role": "assistant", "content": "..."}]
+    _ask("맛집 추천", history)
+    _ask("맛집 추천", history)
+    assert model.calls == 3
+    # 문맥이 있는 답은 캐시에 남기지 않는다
+    assert shared_cache.get_backend().stats()["gemini"]["writes"] == 1
+
+
+def test_history_window(model):
+    history = _history(20)
+    contents = assistant.build_contents(history, "새 질문")
+    assert len(contents) == assistant.HISTORY_TURNS + 1
+    assert [c["parts"][0] for c in contents[1:-1]] == [m["content"] for m in history[-assistant.HISTORY_TURNS + 1:]]
+    assert contents[0]["role"] == "user" and contents[0]["parts"][0].startswith(assistant.SYSTEM_HINT)
+    assert contents[0]["parts"][0].endswith(history[-assistant.HISTORY_TURNS]["content"])
+    assert contents[-1] == {"role": "user", "parts": ["새 질문"]}
+    assert [c["role"] for c in contents[:-1]] == ["user", "model"] * (assistant.HISTORY_TURNS // 2)
+
+
+def test_context_only_on_new_question():
+    contents = assistant.build_contents(_history(2), "질문", context="참고")
+    assert "참고" in contents[-1]["parts"][0] and contents[-1]["parts"][0].endswith("질문: 질문")
+    assert all("참고" not in c["parts"][0] for c in contents[:-1])
+    # 기록이 없으면 안내 문구는 새 질문 앞에 붙는다
+    assert assistant.build_contents([], "질문")[0]["parts"][0] == f"{assistant.SYSTEM_HINT}\n\n질문"
+
+
+def test_trim_history():
+    messages = _history(assistant.MAX_MESSAGES + 7)
+    trimmed = assistant.trim_history(messages)
+    assert len(trimmed) == assistant.MAX_MESSAGES and trimmed == messages[-assistant.MAX_MESSAGES:]
+    assert assistant.trim_history(messages[:3]) == messages[:3]
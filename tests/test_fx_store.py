@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+import pytest
+
+import fx_store
+import shared_cache
+
+# 가짜 provider로 환율 저장소 동기화 확인 (네트워크 없이: python -m pytest)
+
+PAIR = "EURKRW"
+TODAY = date(2024, 6, 14)
+
+
+class FakeProvider:
+    # 평일만 값이 있는 provider. upto 이후 날짜는 아직 없는 것처럼, fail=True면 빈 결과
+    def __init__(self, upto=None):
+        self.calls = []
+        self.upto = upto
+        self.fail = False
+
+    def __call__(self, pair, start, end):
+        self.calls.append((start, end))
+        if self.fail: return []
+        days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        return [(d, 1400.0 + d.day) for d in days if d.weekday() < 5 and (self.upto is None or d <= self.upto)]
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    fake = FakeProvider()
+    monkeypatch.setattr(fx_store, "DB_PATH", str(tmp_path / "fx.sqlite"))
+    monkeypatch.setattr(fx_store, "fetch_daily", fake)
+    backend = shared_cache.get_backend()
+    shared_cache.set_backend(shared_cache.NullBackend())
+    yield fake
+    shared_cache.set_backend(backend)
+
+
+def test_first_sync_then_only_recent_days(provider):
+    assert fx_store.sync(PAIR, 7, today=TODAY) > 0
+    assert provider.calls == [(TODAY - timedelta(days=7), TODAY)]
+    provider.calls.clear()
+    fx_store.sync(PAIR, 7, today=TODAY + timedelta(days=3))
+    # 마지막 저장일 앞 REFETCH_DAYS일부터만 다시 받는다
+    assert provider.calls == [(TODAY - timedelta(days=fx_store.REFETCH_DAYS), TODAY + timedelta(days=3))]
+
+
+def test_longer_window_fetches_only_front_gap(provider):
+    fx_store.sync(PAIR, 7, today=TODAY)
+    provider.calls.clear()
+    fx_store.sync(PAIR, 31, today=TODAY)
+    assert (TODAY - timedelta(days=31), TODAY - timedelta(days=8)) in provider.calls
+    assert len(fx_store.load(PAIR, 31, today=TODAY)) > len(fx_store.load(PAIR, 7, today=TODAY))
+
+
+def test_empty_response_does_not_advance_coverage(provider):
+    fx_store.sync(PAIR, 7, today=TODAY)
+    before = fx_store.coverage(PAIR)
+    provider.fail = True
+    fx_store.sync(PAIR, 31, today=TODAY)
+    assert fx_store.coverage(PAIR) == before
+    # 다음 동기화에서 앞쪽 빈 구간을 다시 받아 채운다
+    provider.fail = False
+    provider.calls.clear()
+    fx_store.sync(PAIR, 31, today=TODAY)
+    assert (TODAY - timedelta(days=31), TODAY - timedelta(days=8)) in provider.calls
+    assert fx_store.coverage(PAIR)[0] == TODAY - timedelta(days=31)
+
+
+def test_coverage_ends_at_last_returned_day(provider):
+    provider.upto = TODAY - timedelta(days=1)
+    fx_store.sync(PAIR, 7, today=TODAY)
+    assert fx_store.coverage(PAIR)[1] == TODAY - timedelta(days=1)
+    assert fx_store.load(PAIR, 7, today=TODAY).index.max().date() == TODAY - timedelta(days=1)
@@ -0,0 +1,192 @@
+import pytest
+
+import osm_places
+import shared_cache
+
+# 준비한 요소 목록을 bbox로 재생해 타일 캐시/카테고리 분리/반경 자르기 확인 (네트워크 없이: python -m pytest)
+
+CENTER = (52.5200, 13.4050)
+
+
+def _grid(step=0.004):
+    # 중심 주변 약 ±6km 격자. 각 점에 음식점/호텔/관광지를 하나씩, 몇 점은 두 카테고리에 모두 걸리도록
+    elements, n = [], 0
+    for i in range(-14, 15):
+        for j in range(-10, 11):
+            lat, lng = CENTER[0] + i * step, CENTER[1] + j * step * 1.6
+            for tags in ({"amenity": "restaurant"}, {"tourism": "hotel"}, {"tourism": "museum"}):
+                n += 1
+                elements.append({"type": "node", "id": n, "lat": lat, "lon": lng, "tags": {"name": f"p{n}", **tags}})
+            if (i + j) % 5 == 0:
+                n += 1
+                elements.append({"type": "node", "id": n, "lat": lat, "lon": lng,
+                                 "tags": {"name": f"p{n}", "amenity": "restaurant", "tourism": "attraction"}})
+    return elements
+
+
+ELEMENTS = _grid()
+
+
+class Recorder:
+    # fetch_overpass 대용: 쿼리를 기록하고 replay_overpass로 bbox 안 요소만 돌려준다
+    def __init__(self, elements):
+        self.replay = osm_places.replay_overpass(elements)
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        return self.replay(query)
+
+    def bboxes(self, i=-1):
+        return {tuple(map(float, b.split(","))) for b in osm_places._BBOX_RE.findall(self.queries[i])}
+
+
+def _boxes(tiles):
+    return {tuple(round(v, 5) for v in osm_places.tile_bbox(t)) for t in tiles}
+
+
+@pytest.fixture
+def overpass(monkeypatch):
+    rec = Recorder(ELEMENTS)
+    monkeypatch.setattr(osm_places, "fetch_overpass", rec)
+    backend = shared_cache.get_backend()
+    shared_cache.set_backend(shared_cache.NullBackend())
+    osm_places.clear_cache()
+    osm_places._FAILED_AT[0] = 0.0
+    yield rec
+    osm_places.clear_cache()
+    shared_cache.set_backend(backend)
+
+
+def test_nearby_recenter_fetches_only_new_tiles(overpass):
+    first = osm_places.tiles_for_radius(*CENTER, 3000)
+    osm_places.ensure_tiles(["restaurant"], *CENTER, 3000)
+    assert len(overpass.queries) == 1
+    assert overpass.bboxes() == _boxes(first)
+
+    moved = (CENTER[0] + 0.015, CENTER[1] + 0.01)
+    second = osm_places.tiles_for_radius(*moved, 3000)
+    new = set(second) - set(first)
+    assert new and set(second) & set(first)
+    osm_places.ensure_tiles(["restaurant"], *moved, 3000)
+    assert len(overpass.queries) == 2
+    assert overpass.bboxes() == _boxes(new)
+
+    # 이미 받은 범위 안에서는 다시 요청하지 않는다
+    osm_places.ensure_tiles(["restaurant"], *moved, 1000)
+    assert len(overpass.queries) == 2
+
+
+def test_union_query_is_split_by_category(overpass):
+    cats = ["restaurant", "hotel", "tourism"]
+    osm_places.ensure_tiles(cats, *CENTER, 2000)
+    assert len(overpass.queries) == 1
+    for c in cats:
+        assert osm_places.CATEGORY_TAGS[c] in overpass.queries[0]
+
+    tiles = osm_places.tiles_for_radius(*CENTER, 2000)
+    for c in cats:
+        assert set(osm_places._TILES[c]) == set(tiles)
+        key, pattern = osm_places.CATEGORY_MATCH[c]
+        got = [e for t in osm_places._TILES[c].values() for e in t.elements]
+        assert got and all(pattern.search(e["tags"].get(key, "")) for e in got)
+        # 각 타일에는 그 타일 안에 있는 요소만
+        for t, tile in osm_places._TILES[c].items():
+            assert all(osm_places.tile_of(e["lat"], e["lon"]) == t for e in tile.elements)
+
+    # 음식점이면서 관광지인 요소는 양쪽 모두에 들어간다
+    both = {e["id"] for e in ELEMENTS if e["tags"].get("tourism") == "attraction"}
+    ids = {c: {e["id"] for t in osm_places._TILES[c].values() for e in t.elements} for c in cats}
+    assert both & ids["restaurant"] & ids["tourism"]
+    assert not both & ids["hotel"]
+
+
+@pytest.mark.parametrize("radius", [500, 1234, 3000])
+def test_results_cut_to_exact_radius(overpass, radius):
+    got = osm_places.query_elements("restaurant", *CENTER, radius)
+    expected = {e["id"] for e in ELEMENTS if e["tags"].get("amenity") == "restaurant"
+                and osm_places.haversine_m(*CENTER, e["lat"], e["lon"]) <= radius}
+    assert {e["id"] for e in got} == expected
+
+    df = osm_places.query_places("restaurant", *CENTER, radius)
+    assert len(df) == len(expected)
+    assert (osm_places.haversine_m(CENTER[0], CENTER[1], df["lat"].to_numpy(), df["lng"].to_numpy()) <= radius).all()
+
+
+def test_stale_tiles_are_refreshed_in_background(overpass, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(osm_places.fetch_layer, "submit", lambda fn, *args: submitted.append((fn, args)))
+    osm_places.ensure_tiles(["hotel"], *CENTER, 1000)
+    tiles = osm_places.tiles_for_radius(*CENTER, 1000)
+    for t in tiles:
+        osm_places._TILES["hotel"][t].fetched_at -= osm_places.TILE_TTL_S + 1
+
+    # 만료된 타일은 그대로 답하고 갱신은 백그라운드로 한 번만 넘긴다
+    before = len(overpass.queries)
+    assert osm_places.query_elements("hotel", *CENTER, 1000)
+    osm_places.ensure_tiles(["hotel"], *CENTER, 1000)
+    assert len(overpass.queries) == before and len(submitted) == 1
+
+    fn, args = submitted[0]
+    fn(*args)
+    assert len(overpass.queries) == before + 1
+    assert overpass.bboxes() == _boxes(tiles)
+    assert not osm_places._REFRESHING
+
+
+def _restaurant(name, cuisine=None):
+    tags = {"name": name, "amenity": "restaurant"}
+    if cuisine is not None: tags["cuisine"] = cuisine
+    return {"type": "node", "lat": CENTER[0], "lon": CENTER[1], "tags": tags}
+
+
+RESTAURANTS = [
+    _restaurant("bibim", "korean"),
+    _restaurant("trattoria", "Italian"),
+    _restaurant("sushi bar", "sushi;ramen"),
+    _restaurant("dumplings", "dim sum"),
+    _restaurant("pho", "vietnamese"),
+    _restaurant("roastery", "coffee_shop"),
+    _restaurant("kebab", "turkish"),
+    _restaurant("no cuisine"),
+    # 여러 종류에 걸리면 CUISINE_MAP 순서가 앞선 쪽 (문자열 안의 순서와 무관)
+    _restaurant("k-cafe", "coffee;korean"),
+    _restaurant("pizza thai", "thai;pizza"),
+    _restaurant("asian sushi", "asian;sushi"),
+    {"type": "node", "lat": CENTER[0], "lon": CENTER[1], "tags": {"amenity": "restaurant", "cuisine": "korean"}},
+]
+
+
+@pytest.fixture
+def restaurants():
+    return osm_places.classify_elements(RESTAURANTS, "restaurant").set_index("name")
+
+
+def test_classify_cuisine_types(restaurants):
+    assert restaurants["cuisine_type"].to_dict() == {
+        "bibim": "한식", "trattoria": "양식", "sushi bar": "일식", "dumplings": "중식", "pho": "아시안",
+        "roastery": "카페", "kebab": "기타", "no cuisine": "기타",
+        "k-cafe": "한식", "pizza thai": "양식", "asian sushi": "일식",
+    }
+    assert restaurants.loc["pho", "desc"] == "음식점 (아시안)"
+    # 이름 없는 요소는 빠진다
+    assert len(restaurants) == len(RESTAURANTS) - 1
+
+
+def test_non_restaurant_categories_are_not_classified():
+    df = osm_places.classify_elements([_restaurant("museum", "korean")], "tourism")
+    assert df["cuisine_type"].tolist() == ["기타"] and df["desc"].tolist() == ["관광명소"]
+
+
+@pytest.mark.parametrize("selection, expected", [
+    (None, None),
+    ([], None),
+    (["전체"], None),
+    (["전체", "한식"], None),
+    (["한식"], {"bibim", "k-cafe"}),
+    (["기타"], {"kebab", "no cuisine"}),
+    (["일식", "카페", "기타"], {"sushi bar", "asian sushi", "roastery", "kebab", "no cuisine"}),
+])
+def test_cuisine_mask(restaurants, selection, expected):
+    picked = set(restaurants.index[osm_places.cuisine_mask(restaurants, selection)])
+    assert picked == (set(restaurants.index) if expected is None else expected)
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+import shared_cache
+
+# 공유 캐시(SQLite) 동작 확인: 스레드별 연결, hit 때 accessed_at 갱신 간격 (python -m pytest)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return shared_cache.SqliteBackend(path=str(tmp_path / "shared.sqlite"))
+
+
+def _accessed_at(backend, ns, key):
+    with backend._db() as conn:
+        return conn.execute("SELECT accessed_at FROM entries WHERE ns = ? AND key = ?", (ns, key)).fetchone()[0]
+
+
+def test_roundtrip_and_expiry(backend):
+    assert backend.set("ns", "k", {"a": 1}, ttl=60)
+    value, stored_at = backend.get("ns", "k")
+    assert value == {"a": 1}
+    backend.set("ns", "old", 1, ttl=-1)
+    assert backend.get("ns", "old") is None
+    assert backend.stats()["ns"]["hits"] == 1 and backend.stats()["ns"]["misses"] == 1
+
+
+def test_one_connection_per_thread(backend):
+    backend.set("ns", "k", 1, ttl=60)
+    conns = []
+
+    def worker():
+        for _ in range(3):
+            assert backend.get("ns", "k")[0] == 1
+            conns.append(backend._local.conn)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(conns) == 12 and len({id(c) for c in conns}) == 4
+
+
+def test_hits_touch_accessed_at_only_after_interval(backend, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(shared_cache.time, "time", lambda: clock[0])
+    backend.set("ns", "k", 1, ttl=3600)
+
+    clock[0] += shared_cache.TOUCH_INTERVAL_S / 2
+    backend.get("ns", "k")
+    assert _accessed_at(backend, "ns", "k") == 1000.0
+
+    clock[0] += shared_cache.TOUCH_INTERVAL_S
+    backend.get("ns", "k")
+    assert _accessed_at(backend, "ns", "k") == clock[0]
+
+
+def test_reconnects_after_file_is_removed(backend, tmp_path):
+    backend.set("ns", "k", 1, ttl=60)
+    backend._local.conn.close()
+    backend._local.conn = None
+    for f in tmp_path.iterdir(): f.unlink()
+    # 연결이 깨진 뒤 첫 호출은 실패로 세고, 다음 호출부터 스키마를 다시 만들어 동작한다
+    assert backend.get("ns", "k") is None
+    assert backend.set("ns", "k", 2, ttl=60)
+    assert backend.get("ns", "k")[0] == 2
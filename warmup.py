@@ -0,0 +1,89 @@
+import sys
+import time
+import argparse
+
+import crime_data
+import crime_panel
+import external_data
+import geo_data
+import osm_places
+import perf
+
+# ---------------------------------------------------------
+# 배포 전 캐시 미리 만들기 (레플리카가 요청을 받기 전에 실행)
+# ---------------------------------------------------------
+# 첫 사용자가 엑셀 파싱 / 경계 단순화 / 다년도 패널 조립 비용을 내지 않도록
+# 디스크 캐시(.cache: 스냅샷, 경계 단계별 GeoJSON, 환율 저장소, 공유 캐시)를 채운다.
+#   python warmup.py && streamlit run streamlit_app.py
+#   python warmup.py --offline       # 네트워크를 쓰지 않음: 날씨/환율/OSM 건너뜀, 경계는 로컬 파일만 (이미지 빌드 등)
+# 단계 하나가 실패해도 나머지는 계속한다. 앱은 경계/외부 서비스 없이도 동작하므로 그 단계들은 경고만 하고,
+# 종료 코드 1은 필수 단계(범죄 데이터)가 실패했을 때만
+# 프로세스 메모리 안의 캐시(공간 인덱스, 검색 색인)는 앱이 필요할 때 만든다 - 여기서 만들어도 남지 않으므로 다루지 않음
+
+CRIME_FILE_NAME = "2023_berlin_crime.xlsx"   # streamlit_app.CRIME_FILE_NAME과 같게
+MAP_CENTER = (52.5200, 13.4050)               # 지도 기본 중심 (주변 장소 타일)
+MAP_RADIUS_M = 3000
+
+
+def _geometry(network):
+    # 오프라인이면 원본을 받지 않고 로컬 파일(geo/ 또는 캐시)에서 단계별 파일만 만든다
+    missing = [kind for kind in geo_data.SOURCES for level in geo_data.LEVELS
+               if geo_data.get_boundaries(kind, level, allow_fetch=network) is None]
+    if missing: raise RuntimeError(f"경계 데이터 없음: {', '.join(sorted(set(missing)))} (python geo_data.py)")
+
+
+def _crime_tables(crime_file):
+    for df in (crime_data.load_crime_data_excel(crime_file), crime_data.load_region_crime(crime_file)):
+        if df.empty: raise RuntimeError(f"범죄 데이터 없음: {crime_file}")
+
+
+def _places():
+    osm_places.ensure_tiles(list(osm_places.CATEGORY_TAGS), *MAP_CENTER, MAP_RADIUS_M)
+    if not osm_places.query_elements('restaurant', *MAP_CENTER, MAP_RADIUS_M): raise RuntimeError("OSM 타일 없음")
+
+
+def steps(crime_file=CRIME_FILE_NAME, network=True):
+    # (이름, 함수, 필수 여부) - 앞 단계 결과를 뒤 단계가 쓰므로 순서대로
+    out = [
+        ("crime tables", lambda: _crime_tables(crime_file), True),
+        ("crime panel", crime_panel.load_crime_panel, True),
+        ("geometry", lambda: _geometry(network), False),
+    ]
+    if network:
+        out += [
+            ("weather", external_data.fetch_weather_forecast, False),
+            ("fx rates", external_data.fetch_exchange_rate_history, False),
+            ("osm tiles", _places, False),
+        ]
+    return out
+
+
+def warm(crime_file=CRIME_FILE_NAME, network=True, log=print):
+    # -> {단계: (초, 오류 또는 None, 필수 여부)}
+    results = {}
+    for name, fn, required in steps(crime_file, network):
+        t = time.perf_counter()
+        try:
+            with perf.span(f"warmup:{name}"): fn()
+            error = None
+        except Exception as e:
+            error = e
+        results[name] = (time.perf_counter() - t, error, required)
+        status = "" if error is None else (f"  실패: {error}" if required else f"  건너뜀: {error}")
+        if log: log(f"{name:<14} {results[name][0] * 1000:8.0f} ms{status}")
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="베를린 앱 캐시 미리 만들기")
+    ap.add_argument("--offline", action="store_true", help="외부 서비스 호출 단계 건너뛰기")
+    ap.add_argument("--crime-file", default=CRIME_FILE_NAME)
+    args = ap.parse_args(argv)
+    t = time.perf_counter()
+    results = warm(args.crime_file, network=not args.offline)
+    print(f"{'total':<14} {(time.perf_counter() - t) * 1000:8.0f} ms")
+    return 1 if any(err and required for _, err, required in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())